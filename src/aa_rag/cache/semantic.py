@@ -0,0 +1,160 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Tuple
+
+import numpy as np
+
+from aa_rag import setting
+
+
+class QueryCache:
+    """
+    LRU cache of query results keyed by the query embedding. A query whose embedding has a cosine similarity of at least
+    `similarity_threshold` with a cached query of the same namespace hits the cached result. With the default
+    threshold of 1 only the same query hits. The entries carry the version of the data they were computed from, a
+    lookup with another version misses, so a write to the table invalidates its entries. The values are copied on put
+    and on get, so a caller can not change a cached value.
+    """
+
+    # the rounding error of the float32 cosine similarity, so a threshold of 1 still matches the same embedding
+    similarity_tolerance = 1e-5
+
+    def __init__(
+        self,
+        max_size: int = setting.engine.simple_chunk.retrieve.cache_size,
+        ttl_seconds: float = setting.engine.simple_chunk.retrieve.cache_ttl,
+        similarity_threshold: float = setting.engine.simple_chunk.retrieve.cache_similarity,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._lock = threading.RLock()
+        # entry id -> (namespace, version, normalized vector, value, expire time)
+        self._entries: OrderedDict[int, Tuple[Hashable, int, np.ndarray, Any, float]] = OrderedDict()
+        # namespace -> (entry ids, contiguous float32 buffer of their vectors). the rows beyond the ids are free capacity,
+        # a put appends to the buffer, a removal drops it and it is rebuilt lazily on the next lookup
+        self._matrix_s: Dict[Hashable, Tuple[List[int], np.ndarray]] = {}
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _matrix(self, namespace: Hashable) -> Tuple[List[int], np.ndarray] | None:
+        """
+        Return the entry ids of the namespace and the normalized vectors of the entries, one row per id.
+        """
+        if namespace not in self._matrix_s:
+            id_s = [entry_id for entry_id, entry in self._entries.items() if entry[0] == namespace]
+            if not id_s:
+                return None
+            vector = self._entries[id_s[0]][2]
+            buffer = np.empty((max(16, 2 * len(id_s)), vector.shape[0]), dtype=np.float32)
+            for row, entry_id in enumerate(id_s):
+                buffer[row] = self._entries[entry_id][2]
+            self._matrix_s[namespace] = (id_s, buffer)
+        id_s, buffer = self._matrix_s[namespace]
+        return id_s, buffer[: len(id_s)]
+
+    def _append(self, namespace: Hashable, entry_id: int, vector: np.ndarray):
+        """
+        Append the vector of a new entry to the buffer of its namespace, if the buffer is built.
+        """
+        if namespace not in self._matrix_s:
+            return
+        id_s, buffer = self._matrix_s[namespace]
+        if len(id_s) == buffer.shape[0]:
+            grown = np.empty((2 * buffer.shape[0], buffer.shape[1]), dtype=np.float32)
+            grown[: len(id_s)] = buffer
+            buffer = grown
+            self._matrix_s[namespace] = (id_s, buffer)
+        buffer[len(id_s)] = vector
+        id_s.append(entry_id)
+
+    def _remove(self, entry_id: int):
+        namespace = self._entries.pop(entry_id)[0]
+        self._matrix_s.pop(namespace, None)
+
+    def _remove_namespace_version(self, namespace: Hashable, version: int):
+        """
+        Remove the entries of the namespace computed from another version of the data, with one rebuild of its buffer.
+        """
+        for entry_id in [_ for _, entry in self._entries.items() if entry[0] == namespace and entry[1] != version]:
+            del self._entries[entry_id]
+        self._matrix_s.pop(namespace, None)
+
+    def get(self, namespace: Hashable, version: int, vector) -> Any | None:
+        """
+        Return the cached value of the most similar query of the namespace, or None if there is no similar enough
+        query computed from the same version of the data.
+        """
+        if not self.enabled:
+            return None
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            matrix = self._matrix(namespace)
+            if matrix is not None:
+                id_s, vector_s = matrix
+                similarity_s = vector_s @ query
+                best = int(np.argmax(similarity_s))
+                if similarity_s[best] >= self.similarity_threshold - self.similarity_tolerance:
+                    entry_id = id_s[best]
+                    _, entry_version, _, value, expire_time = self._entries[entry_id]
+                    if entry_version == version and expire_time > now:
+                        self._entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return copy.deepcopy(value)
+                    if entry_version != version:
+                        # the data changed, none of the entries computed from an older version can hit again
+                        self._remove_namespace_version(namespace, version)
+                    else:
+                        # expired, the caller computes and stores the fresh value
+                        self._remove(entry_id)
+            self.misses += 1
+            return None
+
+    def put(self, namespace: Hashable, version: int, vector, value: Any):
+        """
+        Cache the value of the query, evicting the least recently used entries beyond `max_size`.
+        """
+        if not self.enabled:
+            return
+        # normalized once here, a lookup is then a single product of the buffer with the query
+        vector = self._normalize(vector)
+        with self._lock:
+            entry_id = self._next_id
+            self._entries[entry_id] = (
+                namespace,
+                version,
+                vector,
+                copy.deepcopy(value),
+                time.monotonic() + self.ttl_seconds,
+            )
+            self._next_id += 1
+            self._append(namespace, entry_id, vector)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
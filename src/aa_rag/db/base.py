@@ -1,5 +1,7 @@
+import copy
+import time
 from abc import abstractmethod, ABC
-from typing import Any, List
+from typing import Any, Dict, Iterator, List
 
 from pandas import DataFrame
 
@@ -20,8 +22,12 @@ def singleton(cls):
 class BaseDataBase:
     _db_type: Any
     _conn_obj: Any
+    # seconds the cached table list is used before it is fetched from the database again
+    table_list_ttl: float = 5.0
 
     def __init__(self, **kwargs):
+        self._table_name_cache: set[str] = set()
+        self._table_list_time = 0.0
         self._conn_obj = self.connect(**kwargs)
 
     @property
@@ -40,6 +46,27 @@ class BaseDataBase:
     def table_list(self) -> List[str]:
         return NotImplemented
 
+    def has_table(self, table_name: str, refresh: bool = False) -> bool:
+        """
+        Check whether the table exists. The table list is cached for `table_list_ttl` seconds, a table created or
+        dropped by another process is seen after it expires.
+
+        Args:
+            table_name (str): The name of the table.
+            refresh (bool, optional): Fetch the table list from the database, e.g. before creating a table that the
+                cached list reports missing. Defaults to False.
+
+        Returns:
+            bool: True if the table exists, False otherwise.
+        """
+        if refresh or time.monotonic() - self._table_list_time >= self.table_list_ttl:
+            # updated in place, the views returned by `using` share the cache
+            table_name_s = set(self.table_list())
+            self._table_name_cache.clear()
+            self._table_name_cache.update(table_name_s)
+            self._table_list_time = time.monotonic()
+        return table_name in self._table_name_cache
+
     @abstractmethod
     def create_table(self, table_name, schema, **kwargs):
         return NotImplemented
@@ -57,12 +84,25 @@ class BaseDataBase:
         """
         Set the table or collection to use. This is useful for chaining methods.
 
+        The database objects are shared by the requests, which run in worker threads, so the backends do not set the
+        table on the shared object. They return a view bound to the table instead, see `_bound`, and the table must be
+        used through the returned object, e.g. `with db.using(name) as table: table.insert(...)`.
+
         Returns:
-            self
+            The database bound to the table.
 
         """
         return self
 
+    def _bound(self, **state):
+        """
+        Return a shallow copy of the database with the given attributes set. The copy shares the connection and the
+        caches with the database, only the attributes given here are its own.
+        """
+        bound = copy.copy(self)
+        bound.__dict__.update(state)
+        return bound
+
     def __enter__(self):
         return self
 
@@ -78,8 +118,39 @@ class BaseVectorDataBase(BaseDataBase, ABC):
     _db_type: VectorDBType
 
     def __init__(self, **kwargs):
+        self._table_versions: Dict[str, int] = {}
         super().__init__(**kwargs)
 
+    def table_version(self, table_name: str) -> int:
+        """
+        Return the version of the table. The version changes whenever the table is written, so it can be used to
+        invalidate the caches built from the table content.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            int: The version of the table.
+        """
+        return self._table_versions.get(table_name, 0)
+
+    def ensure_index(self, table_name: str, **kwargs) -> bool:
+        """
+        Make sure the vector column of the table is indexed. Databases that build the index on table creation do
+        nothing.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            bool: True if an index was created, False otherwise.
+        """
+        return False
+
+    def _bump_table_version(self, table_name: str | None):
+        if table_name is not None:
+            self._table_versions[table_name] = self._table_versions.get(table_name, 0) + 1
+
     @abstractmethod
     def insert(self, data: list[dict] | DataFrame, **kwargs):
         return NotImplemented
@@ -114,3 +185,29 @@ class BaseNoSQLDataBase(BaseDataBase, ABC):
     @abstractmethod
     def select(self, query: dict|None = None):
         return NotImplemented
+
+    def iselect(self, query: dict | None = None) -> Iterator[dict]:
+        """
+        Iterate over the records that meet the MongoDB query criteria. The backends override it to yield the records
+        one by one instead of building the whole result list, for callers that iterate the result only once.
+
+        Args:
+            query: A dict representing the MongoDB query.
+
+        Returns:
+            Iterator[dict]: The matching records.
+        """
+        return iter(self.select(query))
+
+    def upsert(self, data: dict, query: dict):
+        """
+        Update the records that meet the MongoDB query criteria with the data, or insert the data if no record meets
+        them. The backends override it to do it in a single write.
+
+        Args:
+            data: The document to write.
+            query: A dict representing the MongoDB query.
+        """
+        if not self.select(query):
+            return self.insert(data)
+        return self.update(data, query)
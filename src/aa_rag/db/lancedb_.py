@@ -1,3 +1,4 @@
+import math
 from typing import List
 from pandas import DataFrame
 from aa_rag import setting
@@ -34,6 +35,55 @@ class LanceDBDataBase(BaseVectorDataBase):
     def table_list(self, **kwargs) -> List[str]:
         return list(self.connection.table_names(**kwargs))
 
+    def table_version(self, table_name: str) -> int:
+        return self.connection.open_table(table_name).version
+
+    def ensure_index(
+        self,
+        table_name: str,
+        vector_column: str = "vector",
+        min_rows: int = setting.storage.lancedb.index_min_rows,
+        index_type: str = setting.storage.lancedb.index_type,
+        **kwargs,
+    ) -> bool:
+        """
+        Build an ANN index on the vector column once the table has at least `min_rows` rows. Smaller tables are
+        scanned faster without an index. Does nothing if the column is already indexed.
+
+        The default IVF_HNSW_SQ index stores the vectors scalar-quantized to int8, which reads 4x fewer bytes than the
+        float32 vectors during the search. The PQ index types compress further with product quantization.
+
+        Args:
+            table_name (str): The name of the table.
+            vector_column (str, optional): The name of the vector column. Defaults to "vector".
+            min_rows (int, optional): The minimum number of rows to build the index.
+            index_type (str, optional): The type of the index. Defaults to setting.storage.lancedb.index_type.
+
+        Returns:
+            bool: True if the index was created, False otherwise.
+        """
+        table = self.connection.open_table(table_name)
+        if any(vector_column in index.columns for index in table.list_indices()):
+            return False
+
+        num_rows = table.count_rows()
+        if num_rows < min_rows:
+            return False
+
+        if index_type.endswith("PQ"):
+            dimension = table.schema.field(vector_column).type.list_size
+            kwargs.setdefault("num_sub_vectors", max(1, dimension // 16))
+
+        table.create_index(
+            metric="l2",  # the distance used by the langchain LanceDB vector store
+            num_partitions=int(math.sqrt(num_rows)),
+            vector_column_name=vector_column,
+            replace=False,
+            index_type=index_type,
+            **kwargs,
+        )
+        return True
+
     def get_table(self, table_name, **kwargs):
         self._table_obj = self.connection.open_table(table_name, **kwargs)
         return self
@@ -45,8 +95,10 @@ class LanceDBDataBase(BaseVectorDataBase):
             raise ValueError("Schema must be an instance of LanceModel.")
 
         self.connection.create_table(name=table_name, schema=schema, **kwargs)
+        self._table_name_cache.add(table_name)
 
     def drop_table(self, table_name):
+        self._table_name_cache.discard(table_name)
         return self.connection.drop_table(table_name)
 
     def select(self, where: str|None = None, **kwargs) -> DataFrame:
@@ -1,4 +1,5 @@
 import copy
+import json
 from pathlib import Path
 from typing import List, Union, Dict
 
@@ -34,6 +35,7 @@ class MilvusDataBase(BaseVectorDataBase):
             uri = uri
         else:
             Path(uri).parent.mkdir(parents=True, exist_ok=True)
+        self._fields_cache: Dict[str, List[dict]] = {}
         super().__init__(uri=uri, user=user, password=password, db_name=db_name, **kwargs)
 
     @property
@@ -61,7 +63,7 @@ class MilvusDataBase(BaseVectorDataBase):
                 index_params = self.connection.prepare_index_params()
                 index_params.add_index(
                     field_name="vector",
-                    index_type="AUTOINDEX",
+                    index_type=setting.storage.milvus.index_type,
                     metric_type="L2",
                 )
                 self.connection.create_collection(
@@ -69,19 +71,21 @@ class MilvusDataBase(BaseVectorDataBase):
                     schema=schema,
                     index_params=index_params,
                 )
+            self._table_name_cache.add(table_name)
         else:
             raise ValueError(f"Collection {table_name} already exists")
 
     def drop_table(self, table_name: str):
         """Drop specified collection"""
         self.connection.drop_collection(table_name)
+        self._table_name_cache.discard(table_name)
+        self._fields_cache.pop(table_name, None)
+        self._bump_table_version(table_name)
 
     def using(self, collection_name: str, **kwargs):
-        """Set table to use"""
+        """Return the database bound to the collection"""
         self.connection.load_collection(collection_name=collection_name)
-        self.using_collection_name = collection_name
-
-        return self
+        return self._bound(using_collection_name=collection_name)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         # self.connection.release_collection(collection_name=self.using_collection_name)
@@ -95,20 +99,27 @@ class MilvusDataBase(BaseVectorDataBase):
         """Insert data into collection"""
         assert self.using_collection_name, "Collection not loaded. Use using() first"
         res = self.connection.insert(collection_name=self.using_collection_name, data=data)
+        self._bump_table_version(self.using_collection_name)
         return res
 
     def delete(self, where: str, **kwargs):
         """Delete entities with boolean expression"""
         assert self.using_collection_name, "Collection not loaded. Use using() first"
-        return self.connection.delete(self.using_collection_name, filter=where, **kwargs)
+        res = self.connection.delete(self.using_collection_name, filter=where, **kwargs)
+        self._bump_table_version(self.using_collection_name)
+        return res
 
     def upsert(self, data: list[dict] | DataFrame, **kwargs):
         """Upsert data into collection with JSON merge support"""
         assert self.using_collection_name, "Collection not loaded. Use using() first"
 
         def update_old_json_with_new(new_data):
-            # 获取字段描述
-            fields = self.connection.describe_collection(self.using_collection_name)["fields"]
+            # 获取字段描述. the schema of a collection does not change, so it is described once.
+            if self.using_collection_name not in self._fields_cache:
+                self._fields_cache[self.using_collection_name] = self.connection.describe_collection(
+                    self.using_collection_name
+                )["fields"]
+            fields = self._fields_cache[self.using_collection_name]
 
             # 健壮的主键获取（修复问题4）
             primary_keys = [field["name"] for field in fields if field.get("is_primary", False)]
@@ -118,16 +129,16 @@ class MilvusDataBase(BaseVectorDataBase):
 
             json_fields = [field["name"] for field in fields if field["type"] == DataType.JSON]
 
-            # 获取所有需要更新的字段（修复问题3）
-            all_fields = list({primary_key}.union(json_fields, *[d.keys() for d in new_data]))
-
             # 构建查询表达式（修复潜在的类型问题）
             pk_values = [str(d[primary_key]) for d in new_data if primary_key in d]
             if not pk_values:
                 return new_data  # 无主键直接插入新数据
 
-            # 查询旧数据（包含所有必要字段）
-            old_data = self.query(expr=f"{primary_key} in {pk_values}", output_fields=all_fields)
+            # 查询旧数据. only the json fields are merged, so the other fields (e.g. the vector) are not fetched.
+            old_data = self.query(
+                expr=f"{primary_key} in {json.dumps(pk_values, ensure_ascii=False)}",
+                output_fields=[primary_key, *json_fields],
+            )
             old_data_map = {str(d[primary_key]): d for d in old_data}
 
             # 递归合并函数（修复问题2）
@@ -173,7 +184,9 @@ class MilvusDataBase(BaseVectorDataBase):
         processed_data = update_old_json_with_new(data)
 
         # 执行upsert
-        return self.connection.upsert(collection_name=self.using_collection_name, data=processed_data)
+        res = self.connection.upsert(collection_name=self.using_collection_name, data=processed_data)
+        self._bump_table_version(self.using_collection_name)
+        return res
 
     def overwrite(self, data: list[dict] | DataFrame, **kwargs):
         assert self.using_collection_name, "Collection not loaded. Use using() first"
@@ -234,7 +247,7 @@ if __name__ == "__main__":
     print(milvus_db.table_list())
 
     with milvus_db.using("user_guide_chunk_text_embedding_3_small") as db:
-        milvus_db.query(
+        db.query(
             "id in ['8672a4c387ff30688588e22f2e5e7c6c']",
             limit=10,
             output_fields=["id", "text"],
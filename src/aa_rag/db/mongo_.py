@@ -64,26 +64,27 @@ class MongoDBDataBase(BaseNoSQLDataBase):
         Returns:
             The collection object.
         """
-        if collection_name in self.table_list():
+        if self.has_table(collection_name):
             return self.connection[collection_name]
         else:
             # The create_collection method will raise an exception if the collection exists,
             # so we check for its existence first.
-            return self.connection.create_collection(collection_name, **kwargs)
+            collection = self.connection.create_collection(collection_name, **kwargs)
+            self._table_name_cache.add(collection_name)
+            return collection
 
     def using(self, collection_name: str, **kwargs):
         """
-        Set the current active collection and return self to support method chaining.
+        Return the database bound to the collection, to support method chaining.
 
         Args:
             collection_name: The name of the collection.
             **kwargs: Reserved for additional parameters.
 
         Returns:
-            self
+            The database bound to the collection.
         """
-        self.collection = self.connection[collection_name]
-        return self
+        return self._bound(collection=self.connection[collection_name])
 
     def table_list(self):
         """
@@ -101,6 +102,7 @@ class MongoDBDataBase(BaseNoSQLDataBase):
         Returns:
             The result of the drop operation.
         """
+        self._table_name_cache.discard(collection_name)
         return self.connection.drop_collection(collection_name)
 
     def insert(self, data):
@@ -165,6 +167,15 @@ class MongoDBDataBase(BaseNoSQLDataBase):
         # find() returns a Cursor; convert it to a list to retrieve all results.
         return list(self.collection.find(filter_query))
 
+    def iselect(self, query: dict | None = None):
+        """
+        Iterate over the documents matching the MongoDB query. The cursor fetches the documents from the server in
+        batches while iterating.
+        """
+        assert self.collection is not None, "Collection not loaded. Use using() first"
+
+        return self.collection.find(self._build_query_mongo(query))
+
     def update(self, update_data: dict, query: dict | None = None):
         """
         Update documents in the collection that match the MongoDB query condition.
@@ -185,6 +196,19 @@ class MongoDBDataBase(BaseNoSQLDataBase):
         result = self.collection.update_many(filter_query, {"$set": update_data})
         return result.modified_count
 
+    def upsert(self, data: dict, query: dict):
+        """
+        Update the document that matches the MongoDB query condition, or insert the data if there is none.
+
+        Returns:
+            The number of documents that were modified or inserted.
+        """
+        assert self.collection is not None, "Collection not loaded. Use using() first"
+
+        filter_query = self._build_query_mongo(query)
+        result = self.collection.update_one(filter_query, {"$set": data}, upsert=True)
+        return result.modified_count + (result.upserted_id is not None)
+
     def delete(self, query: dict | None = None):
         """
         Delete documents in the collection that match the MongoDB query condition.
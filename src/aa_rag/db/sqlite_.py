@@ -0,0 +1,325 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from aa_rag import setting
+from aa_rag.db.base import BaseNoSQLDataBase, singleton
+from aa_rag.gtypes.enums import NoSQLDBType
+
+
+@singleton
+class SQLiteDataBase(BaseNoSQLDataBase):
+    """
+    NoSQL database backed by SQLite. Each table stores one JSON document per row, and the MongoDB query syntax is
+    translated to SQL with the JSON1 functions, so the filtering runs in SQLite instead of scanning the documents in
+    Python. The fields used in equality queries are indexed automatically.
+    """
+
+    table_name: str | None = None
+    _db_type = NoSQLDBType.SQLITE
+
+    def __init__(self, uri: str = setting.storage.sqlite.uri, **kwargs):
+        self.uri = uri
+        # create parent directory if not exist
+        Path(self.uri).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()  # the connection is shared by the worker threads
+        self._table_s: set[str] = set()
+        self._index_s: set[Tuple[str, str]] = set()
+        super().__init__(**kwargs)
+
+    def connect(self):
+        connection = sqlite3.connect(self.uri, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        connection.execute("PRAGMA cache_size=-64000")  # 64 MB page cache
+        return connection
+
+    @staticmethod
+    def _quote(identifier: str) -> str:
+        return '"' + identifier.replace('"', '""') + '"'
+
+    @staticmethod
+    def _field_expr(field: str) -> str:
+        """
+        Return the SQL expression of a document field. A dotted field is a path into the nested documents, as in
+        MongoDB. The JSON path is inlined instead of bound as a parameter, so the expression matches the expression
+        index of the field.
+        """
+        if '"' in field:
+            raise ValueError(f"Unsupported field name: {field}")
+        path = "$" + "".join(f'."{key}"' for key in field.split(".")).replace("'", "''")
+        return f"json_extract(doc, '{path}')"
+
+    @staticmethod
+    def _to_sql_value(value: Any) -> Any:
+        """
+        Convert a python value to the value returned by `json_extract` for the same JSON value.
+        """
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        return value
+
+    def create_table(self, table_name, **kwargs):
+        with self._lock, self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._quote(table_name)} "
+                f"(id INTEGER PRIMARY KEY AUTOINCREMENT, doc TEXT NOT NULL)"
+            )
+        self._table_s.add(table_name)
+        self._table_name_cache.add(table_name)
+
+    def using(self, table_name, **kwargs):
+        """
+        get table object by table name, create the table if not exist. return the database bound to the table for with
+        statement.
+        """
+        if table_name not in self._table_s:
+            self.create_table(table_name)
+        return self._bound(table_name=table_name)
+
+    def table_list(self):
+        """
+        return all table names in the database.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def drop_table(self, table_name):
+        """
+        drop table by table name.
+        """
+        with self._lock, self.connection:
+            self.connection.execute(f"DROP TABLE IF EXISTS {self._quote(table_name)}")
+        self._table_s.discard(table_name)
+        self._table_name_cache.discard(table_name)
+        # updated in place, the views returned by `using` share the set
+        self._index_s.difference_update([_ for _ in self._index_s if _[0] == table_name])
+
+    def _ensure_field_index(self, field: str):
+        """
+        Create an expression index on the field of the table in use.
+        """
+        key = (self.table_name, field)
+        if key in self._index_s:
+            return
+        index_name = self._quote(f"idx_{self.table_name}_{field}")
+        with self._lock, self.connection:
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {self._quote(self.table_name)} ({self._field_expr(field)})"
+            )
+        self._index_s.add(key)
+
+    def _build_query_mongo(self, mongo_query: dict) -> Tuple[str, List[Any]]:
+        """
+        Convert MongoDB query syntax to a SQL where clause and its parameters.
+
+        Supported MongoDB query operators include:
+          - Comparison operators: $gt, $gte, $lt, $lte, $eq, $ne
+          - Collection operators: $in, $nin
+          - Existence judgment: $exists
+          - Logical operators: $and, $or, $nor, $not
+
+        Example:
+          {"age": {"$gt": 30, "$lt": 50}, "name": "John"}
+          Equivalent to:
+          (json_extract(doc, '$."age"') > ?) AND (json_extract(doc, '$."age"') < ?) AND (json_extract(doc, '$."name"') = ?)
+        """
+        if not isinstance(mongo_query, dict):
+            raise ValueError("Mongo Query Condition Must Be A Dict")
+
+        clause_s, param_s = [], []
+        for key, condition in mongo_query.items():
+            if key in ("$and", "$or", "$nor"):
+                sub_s = [self._build_query_mongo(sub) for sub in condition]
+                joined = (" AND " if key == "$and" else " OR ").join(f"({sub_clause})" for sub_clause, _ in sub_s)
+                clause_s.append(f"NOT ({joined})" if key == "$nor" else joined)
+                param_s += [param for _, sub_param_s in sub_s for param in sub_param_s]
+            elif key == "$not":
+                sub_clause, sub_param_s = self._build_query_mongo(condition)
+                clause_s.append(f"NOT ({sub_clause})")
+                param_s += sub_param_s
+            elif isinstance(condition, dict):
+                for op, val in condition.items():
+                    clause, op_param_s = self._build_field_condition(key, op, val)
+                    clause_s.append(clause)
+                    param_s += op_param_s
+            else:
+                # make a direct judgment of equal value
+                clause, op_param_s = self._build_field_condition(key, "$eq", condition)
+                clause_s.append(clause)
+                param_s += op_param_s
+
+        if not clause_s:
+            return "1", []
+        return " AND ".join(f"({clause})" for clause in clause_s), param_s
+
+    def _build_field_condition(self, field: str, op: str, val: Any) -> Tuple[str, List[Any]]:
+        expr = self._field_expr(field)
+        match op:
+            case "$eq":
+                self._ensure_field_index(field)
+                if val is None:
+                    return f"{expr} IS NULL", []
+                return f"{expr} = ?", [self._to_sql_value(val)]
+            case "$ne":
+                return f"{expr} IS NOT ?", [self._to_sql_value(val)]
+            case "$gt":
+                return f"{expr} > ?", [self._to_sql_value(val)]
+            case "$gte":
+                return f"{expr} >= ?", [self._to_sql_value(val)]
+            case "$lt":
+                return f"{expr} < ?", [self._to_sql_value(val)]
+            case "$lte":
+                return f"{expr} <= ?", [self._to_sql_value(val)]
+            case "$in" | "$nin":
+                if not isinstance(val, list):
+                    raise ValueError(f"{op} requires a list value")
+                placeholder_s = ", ".join("?" for _ in val)
+                param_s = [self._to_sql_value(_) for _ in val]
+                if op == "$in":
+                    self._ensure_field_index(field)
+                    return f"{expr} IN ({placeholder_s})", param_s
+                return f"{expr} IS NULL OR {expr} NOT IN ({placeholder_s})", param_s
+            case "$exists":
+                path_expr = expr.replace("json_extract", "json_type", 1)
+                return (f"{path_expr} IS NOT NULL" if val else f"{path_expr} IS NULL"), []
+            case _:
+                raise ValueError(f"Unsupported Operation: {op}")
+
+    def insert(self, data: Dict | List[Dict]):
+        """
+        insert a document or a list of documents into table.
+
+        Returns:
+            The id of the inserted document, or the id list if a list is inserted.
+        """
+        assert self.table_name is not None, "Table is not set, please use `using` method to set the table."
+        sql = f"INSERT INTO {self._quote(self.table_name)} (doc) VALUES (?)"
+        with self._lock, self.connection:
+            if isinstance(data, dict):
+                return self.connection.execute(sql, (json.dumps(data, ensure_ascii=False),)).lastrowid
+            elif isinstance(data, list):
+                return [self.connection.execute(sql, (json.dumps(_, ensure_ascii=False),)).lastrowid for _ in data]
+            else:
+                raise ValueError("Inserted data must be a dict or a list of dicts")
+
+    def select(self, query: dict | None = None) -> List[Dict]:
+        """
+        Select records according to MongoDB query syntax.
+
+        Example:
+            query = {"age": {"$gt": 30}, "$or": [{"name": "Alice"}, {"name": "Bob"}]}
+            results = db.select(query)
+        """
+        return list(self.iselect(query))
+
+    def iselect(self, query: dict | None = None, batch_size: int = 256) -> Iterator[Dict]:
+        """
+        Iterate over the records that meet the MongoDB query criteria. The rows are fetched from the cursor in batches,
+        so the whole result is never held in memory.
+        """
+        assert self.table_name is not None, "Table is not set, please use `using` method to set the table."
+        where, param_s = self._build_query_mongo(query or {})
+        with self._lock:
+            cursor = self.connection.execute(
+                f"SELECT doc FROM {self._quote(self.table_name)} WHERE {where} ORDER BY id", param_s
+            )
+
+        def iterate():
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for row in rows:
+                    yield json.loads(row[0])
+
+        return iterate()
+
+    def update(self, update_data: dict, query: dict | None = None) -> int:
+        """
+        Update records that meet MongoDB query criteria.
+
+        Args:
+            update_data: A dictionary that specifies the fields and values to be updated.
+            query: MongoDB dictionary of query syntax, used to select records that need to be updated.
+                   If query is None or an empty dictionary, all records are updated.
+
+        Returns:
+            int: The number of updated records.
+        """
+        assert self.table_name is not None, "Table is not set, please use `using` method to set the table."
+        if not update_data:
+            return 0
+        set_expr, set_param_s = self._build_set(update_data)
+        where, param_s = self._build_query_mongo(query or {})
+        with self._lock, self.connection:
+            return self.connection.execute(
+                f"UPDATE {self._quote(self.table_name)} SET doc = {set_expr} WHERE {where}", set_param_s + param_s
+            ).rowcount
+
+    @staticmethod
+    def _build_set(update_data: dict) -> Tuple[str, List[Any]]:
+        """
+        Build the SQL expression that sets the top level fields of the document, and its parameters.
+        """
+        set_arg_s, set_param_s = [], []
+        for field, value in update_data.items():
+            if '"' in field:
+                raise ValueError(f"Unsupported field name: {field}")
+            set_arg_s.append("?, json(?)")
+            set_param_s += [f'$."{field}"', json.dumps(value, ensure_ascii=False)]
+        return f"json_set(doc, {', '.join(set_arg_s)})", set_param_s
+
+    def upsert(self, data: dict, query: dict) -> int:
+        """
+        Update the records that meet MongoDB query criteria with the data, or insert the data if there is none. Both
+        statements run in one transaction, so the write is committed once.
+
+        Returns:
+            int: The number of updated or inserted records.
+        """
+        assert self.table_name is not None, "Table is not set, please use `using` method to set the table."
+        set_expr, set_param_s = self._build_set(data)
+        where, param_s = self._build_query_mongo(query)
+        with self._lock, self.connection:
+            count = self.connection.execute(
+                f"UPDATE {self._quote(self.table_name)} SET doc = {set_expr} WHERE {where}", set_param_s + param_s
+            ).rowcount
+            if count:
+                return count
+            self.connection.execute(
+                f"INSERT INTO {self._quote(self.table_name)} (doc) VALUES (?)", (json.dumps(data, ensure_ascii=False),)
+            )
+            return 1
+
+    def delete(self, query: dict | None = None) -> int:
+        """
+        Delete records that meet MongoDB query criteria.
+
+        Args:
+            query: MongoDB dictionary of query syntax, used to select records to be deleted.
+                   If query is None or an empty dictionary, all records are deleted.
+
+        Returns:
+            int: The number of deleted records.
+        """
+        assert self.table_name is not None, "Table is not set, please use `using` method to set the table."
+        where, param_s = self._build_query_mongo(query or {})
+        with self._lock, self.connection:
+            return self.connection.execute(f"DELETE FROM {self._quote(self.table_name)} WHERE {where}", param_s).rowcount
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.table_name = None
+        return False
+
+    def close(self):
+        self.connection.close()
@@ -1,13 +1,46 @@
+import json
+import os
+import threading
+from functools import lru_cache
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
+import orjson
 from tinydb import TinyDB, Query
-from tinydb.table import Table
+from tinydb.storages import JSONStorage
+from tinydb.table import Document, Table
 
 from aa_rag import setting
 from aa_rag.db.base import BaseNoSQLDataBase, singleton
 from aa_rag.gtypes.enums import NoSQLDBType
 
 
+class ORJSONStorage(JSONStorage):
+    """
+    TinyDB JSON storage serialized with orjson. TinyDB reads and rewrites the whole file on each operation, so the
+    (de)serialization speed bounds every query and write.
+    """
+
+    def __init__(self, path: str, create_dirs=False, access_mode="rb+", **kwargs):
+        super().__init__(path, create_dirs=create_dirs, access_mode=access_mode, **kwargs)
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        self._handle.seek(0)
+        content = self._handle.read()
+        # an empty file lets TinyDB initialize the database
+        return orjson.loads(content) if content else None
+
+    def write(self, data: Dict[str, Dict[str, Any]]):
+        self._handle.seek(0)
+        # json.dumps, which TinyDB used, turns the int, float and bool keys of the documents into strings, orjson only
+        # does it with the option
+        self._handle.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        # remove the old data behind the cursor in case the file has gotten shorter
+        self._handle.truncate()
+
+
 @singleton
 class TinyDBDataBase(BaseNoSQLDataBase):
     table: Table | None = None
@@ -17,6 +50,11 @@ class TinyDBDataBase(BaseNoSQLDataBase):
         self.uri = uri
         # create parent directory if not exist
         Path(self.uri).parent.mkdir(parents=True, exist_ok=True)
+        # the built query is immutable, so the same query dict can share it. reusing the same query object also lets
+        # TinyDB hit its own query result cache.
+        self._compile_query = lru_cache(maxsize=256)(lambda key: self._build_query_mongo(json.loads(key)))
+        # TinyDB reads and rewrites the file without locking, the requests of the worker threads take turns
+        self._lock = threading.RLock()
         super().__init__(**kwargs)
 
     @property
@@ -24,35 +62,40 @@ class TinyDBDataBase(BaseNoSQLDataBase):
         return self._conn_obj
 
     def connect(self):
-        return TinyDB(self.uri)
+        return TinyDB(self.uri, storage=ORJSONStorage)
 
     def create_table(self, table_name, **kwargs):
-        return self.connection.table(table_name, **kwargs)
+        with self._lock:
+            return self.connection.table(table_name, **kwargs)
 
     def using(self, table_name, **kwargs):
         """
-        get table object by table name, return self for with statement.
+        get table object by table name, return the database bound to the table for with statement.
         """
-        self.table: Table = self.connection.table(table_name, **kwargs)
-        return self
+        with self._lock:
+            return self._bound(table=self.connection.table(table_name, **kwargs))
 
     def table_list(self):
         """
         return all table names in the database.
         """
-        return self.connection.tables()
+        with self._lock:
+            return self.connection.tables()
 
     def drop_table(self, table_name):
         """
         drop table by table name.
         """
-        return self.connection.drop_table(table_name)
+        self._table_name_cache.discard(table_name)
+        with self._lock:
+            return self.connection.drop_table(table_name)
 
     def insert(self, data):
         """
         insert data into table.
         """
-        return self.table.insert(data)
+        with self._lock:
+            return self.table.insert(data)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.table = None
@@ -61,6 +104,34 @@ class TinyDBDataBase(BaseNoSQLDataBase):
     def close(self):
         self.connection.close()
 
+    @staticmethod
+    def _build_in_test(values: List[Any]) -> Callable[[Any], bool]:
+        """
+        Build the membership test of $in/$nin. The values are put into a set when they are hashable.
+        """
+        try:
+            value_set = frozenset(values)
+        except TypeError:
+            return lambda v: v in values
+
+        def test(v):
+            try:
+                return v in value_set
+            except TypeError:  # unhashable field value, e.g. a list
+                return v in values
+
+        return test
+
+    def _get_query(self, mongo_query: dict):
+        """
+        Get the TinyDB query expression of the MongoDB query, the built expressions are cached by the query content.
+        """
+        try:
+            key = json.dumps(mongo_query, sort_keys=True)
+        except TypeError:  # the query contains values that are not JSON serializable, build it without caching
+            return self._build_query_mongo(mongo_query)
+        return self._compile_query(key)
+
     def _build_query_mongo(self, mongo_query: dict, q: Query | None = None):
         """
         Convert MongoDB query syntax to TinyDB query expressions.
@@ -124,14 +195,14 @@ class TinyDBDataBase(BaseNoSQLDataBase):
                                 if not isinstance(val, list):
                                     raise ValueError("$in requires a list value")
                                 # use the test method to construct in query
-                                current = q[field].test(lambda v, lst=val: v in lst)
+                                current = q[field].test(self._build_in_test(val))
                             elif op == "$nin":
                                 if not isinstance(val, list):
                                     raise ValueError("$nin requires a list value")
-                                current = ~(q[field].test(lambda v, lst=val: v in lst))
+                                current = ~(q[field].test(self._build_in_test(val)))
                             elif op == "$exists":
-                                # check the field is None if val is False, otherwise check it is not None
-                                current = (q[field] is not None) if val else (q[field] is None)
+                                # check whether the document has the field, a field with a None value exists
+                                current = q[field].exists() if val else ~q[field].exists()
                             else:
                                 raise ValueError(f"Unsupported Operation: {op}")
                             if field_expr is None:
@@ -163,10 +234,25 @@ class TinyDBDataBase(BaseNoSQLDataBase):
         """
         assert self.table is not None, "Table is not set, please use `using` method to set the table."
 
-        if query is None or not query:
-            return self.table.all()
-        query_obj = self._build_query_mongo(query)
-        return self.table.search(query_obj)
+        query_obj = self._get_query(query) if query else None
+        with self._lock:
+            if query_obj is None:
+                return self.table.all()
+            return self.table.search(query_obj)
+
+    def iselect(self, query: dict | None = None) -> Iterator[Document]:
+        """
+        Iterate over the records that meet the MongoDB query criteria, without building the result list.
+        Args:
+            query: A dict representing the MongoDB query.
+        """
+        assert self.table is not None, "Table is not set, please use `using` method to set the table."
+
+        query_obj = self._get_query(query) if query else None
+        # TinyDB reads the whole table anyway, the documents are read under the lock and filtered lazily
+        with self._lock:
+            doc_s = list(self.table)
+        return (doc for doc in doc_s if query_obj is None or query_obj(doc))
 
     def update(self, update_data: dict, query: dict | None = None):
         """
@@ -181,11 +267,23 @@ class TinyDBDataBase(BaseNoSQLDataBase):
             update_result: Usually an updated record identification list.
         """
         assert self.table is not None, "Table is not set, please use `using` method to set the table."
-        if query is None or not query:
-            # If no query conditions are specified, all records will be updated.
-            return self.table.update(update_data)
-        query_obj = self._build_query_mongo(query)
-        return self.table.update(update_data, query_obj)
+        with self._lock:
+            if query is None or not query:
+                # If no query conditions are specified, all records will be updated.
+                return self.table.update(update_data)
+            query_obj = self._get_query(query)
+            return self.table.update(update_data, query_obj)
+
+    def upsert(self, data: dict, query: dict):
+        """
+        Update the records that meet MongoDB query criteria, or insert the data if there is none, in one file write.
+
+        Returns:
+            The id list of the updated or inserted records.
+        """
+        assert self.table is not None, "Table is not set, please use `using` method to set the table."
+        with self._lock:
+            return self.table.upsert(data, self._get_query(query))
 
     def delete(self, query: dict|None = None):
         """
@@ -199,8 +297,9 @@ class TinyDBDataBase(BaseNoSQLDataBase):
             delete_result: Usually a list of deleted records.
         """
         assert self.table is not None, "Table is not set, please use `using` method to set the table."
-        if query is None or not query:
-            # If no query conditions are specified, all records will be deleted.
-            return self.table.remove()
-        query_obj = self._build_query_mongo(query)
-        return self.table.remove(query_obj)
+        with self._lock:
+            if query is None or not query:
+                # If no query conditions are specified, all records will be deleted.
+                return self.table.remove()
+            query_obj = self._get_query(query)
+            return self.table.remove(query_obj)
@@ -109,7 +109,8 @@ class LightRAGEngine(BaseEngine[LightRAGIndexParams, LightRAGRetrieveParams, Lig
             config.write(f)
 
     async def index(self, params: LightRAGIndexParams):
-        if self.table_name not in self.db.table_list():
+        # a miss of the cached table list is checked again before the table is created
+        if not self.db.has_table(self.table_name) and not self.db.has_table(self.table_name, refresh=True):
             self.db.create_table(self.table_name)
 
         id_s = []
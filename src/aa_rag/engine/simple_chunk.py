@@ -1,19 +1,25 @@
-from typing import List, cast, Union, Tuple
+import asyncio
+import heapq
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, cast, Union, Tuple, Dict, Any
 
-import pandas as pd
-from langchain.retrievers import EnsembleRetriever
 from langchain_community.retrievers import BM25Retriever
-from langchain_community.vectorstores import LanceDB
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.vectorstores import VectorStoreRetriever
-from langchain_milvus import Milvus
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from pydantic import BaseModel, Field
 from rank_bm25 import BM25Okapi
 
 from aa_rag import setting, utils
 from aa_rag.db.base import BaseDataBase, BaseVectorDataBase
+from aa_rag.cache.semantic import QueryCache
 from aa_rag.db.multimodal import StoreImageParams
 from aa_rag.engine.base import BaseEngine, BaseIndexParams
 from aa_rag.gtypes.enums import EngineType, VectorDBType, DBMode, RetrieveType
@@ -21,6 +27,101 @@ from aa_rag.oss import OSSStore, OSSStoreInitParams
 
 dfs_setting = setting.engine.simple_chunk
 
+# runs the dense leg of the sync hybrid retrievals, shared so a retrieval does not start and join a thread of its own
+_hybrid_executor = ThreadPoolExecutor(thread_name_prefix="simple_chunk_hybrid")
+
+
+@lru_cache(maxsize=32)  # bounded, the QA knowledge base sizes the chunks by the text length
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    # the splitter keeps no state between calls, so it is shared by the same chunk settings
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+@lru_cache(maxsize=1024)
+def _make_table_name(knowledge_name: str, engine_type: EngineType, embedding_model: str) -> str:
+    # the engines of the same table share one interned name, which is used as the key of the class-level caches
+    return sys.intern(f"{knowledge_name}__{engine_type}__{embedding_model}".replace("-", "_"))
+
+
+@lru_cache(maxsize=32)
+def _lance_schema(dimension: int):
+    """
+    Build the LanceDB table schema of the vector dimension. The schema is immutable, so it is built once per dimension.
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            pa.field("id", pa.utf8(), False),
+            pa.field(
+                "vector",
+                pa.list_(pa.float32(), dimension),
+                False,
+            ),
+            pa.field("text", pa.utf8(), False),
+            pa.field(
+                "metadata",
+                pa.struct(
+                    [
+                        pa.field("source", pa.utf8(), False),
+                    ]
+                ),
+                False,
+            ),
+        ]
+    )
+
+
+@lru_cache(maxsize=32)
+def _milvus_schema(dimension: int):
+    """
+    Build the Milvus collection schema of the vector dimension. The schema is only read when creating a collection, so
+    it is built once per dimension.
+    """
+    from pymilvus import CollectionSchema, FieldSchema, DataType
+
+    id_field = FieldSchema(
+        name="id",
+        dtype=DataType.VARCHAR,
+        max_length=256,
+        is_primary=True,
+    )
+
+    vector_field = FieldSchema(
+        name="vector",
+        dtype=DataType.FLOAT_VECTOR,
+        dim=dimension,
+    )
+
+    text_field = FieldSchema(
+        name="text",
+        dtype=DataType.VARCHAR,
+        max_length=65535,
+    )
+
+    metadata_field = FieldSchema(
+        name="metadata",
+        dtype=DataType.JSON,
+    )
+
+    identifier_field = FieldSchema(
+        name="identifier",
+        dtype=DataType.ARRAY,
+        element_type=DataType.VARCHAR,
+        max_length=65535,
+        max_capacity=4096,
+    )
+
+    return CollectionSchema(
+        fields=[
+            id_field,
+            vector_field,
+            text_field,
+            metadata_field,
+            identifier_field,
+        ],
+    )
+
 
 # 公共字段
 class SimpleChunkInitParams(BaseModel):
@@ -69,6 +170,20 @@ class SimpleChunk(
         SimpleChunkGenerateParams,
     ]
 ):
+    # caches shared by all engine instances, keyed by (db_type, table_name, ...)
+    # the BM25 index of a table and the tokens of its texts, in least recently used order
+    _bm25_cache: OrderedDict[Tuple[str, str, str], Tuple[Any, float, BM25Retriever, Dict[str, List[str]]]] = (
+        OrderedDict()
+    )
+    _bm25_cache_lock = threading.Lock()
+    _vectorstore_cache: Dict[Tuple[str, str, str], VectorStore] = {}
+    # the retrieve results, keyed by the query embedding and invalidated by the table version
+    _result_cache = QueryCache()
+    # the creation of a table is serialized, otherwise concurrent first index requests both create it and one fails.
+    # the locks only guard the threads of this process.
+    _create_table_locks: Dict[Tuple[str, str], threading.Lock] = {}
+    _create_table_locks_lock = threading.Lock()
+
     @property
     def type(self):
         return EngineType.SimpleChunk
@@ -98,6 +213,8 @@ class SimpleChunk(
         self.knowledge_name = params.knowledge_name
         self.embedding_model = embedding_model
         self.identifier = params.identifier
+        # the identifier is encoded as a JSON string literal, so a quote in it can not change the filter expression
+        self._identifier_expr = f"array_contains(identifier, {json.dumps(self.identifier, ensure_ascii=False)})"
 
         # db
         self.db = utils.get_db(db_type)
@@ -123,10 +240,19 @@ class SimpleChunk(
             params.retrieve_mode,
         )
 
+        # the query is only embedded up front when the result is cached, the dense retrieval then reuses the vector
+        query_vector: List[float] | None = None
+        cache_key = self._result_cache_key(params)
+        if cache_key is not None:
+            query_vector = self.embeddings.embed_query(query)
+            cached = self._result_cache.get(*cache_key, query_vector)
+            if cached is not None:
+                return cached
+
         result: BaseRetriever | List[Document] | None
         match retrieve_type:
             case RetrieveType.DENSE:
-                result = self._dense_retrieve(query, top_k)
+                result = self._dense_retrieve(query, top_k, query_vector=query_vector)
             case RetrieveType.BM25:
                 result = self._bm25_retrieve(query, top_k)
             case RetrieveType.HYBRID:
@@ -140,7 +266,82 @@ class SimpleChunk(
                 raise ValueError(f"Invalid retrieve method: {retrieve_type}")
         assert isinstance(result, List | None), f"Result must be a list, not {type(result)}"
 
-        return [doc.model_dump(include={"metadata", "page_content"}) for doc in result] if result else []
+        result_s = [self._to_result(doc) for doc in result] if result else []
+        if cache_key is not None:
+            self._result_cache.put(*cache_key, query_vector, result_s)
+        return result_s
+
+    async def aretrieve(
+        self,
+        params: SimpleChunkRetrieveParams,
+    ):
+        """
+        Asynchronously retrieve documents based on the provided query and retrieval method. The blocking database and
+        embedding calls run in worker threads, and the dense and sparse retrievals of hybrid mode run concurrently.
+
+        Args:
+            params (SimpleChunkRetrieveParams): The retrieval parameters.
+        Returns:
+            List[Document]: A list of retrieved documents.
+        """
+        assert self.table_exist, f"Table {self.table_name} does not exist."
+
+        query, top_k, retrieve_type = (
+            params.query,
+            params.top_k,
+            params.retrieve_mode,
+        )
+
+        # the query is only embedded up front when the result is cached, the dense retrieval then reuses the vector
+        query_vector: List[float] | None = None
+        cache_key = self._result_cache_key(params)
+        if cache_key is not None:
+            query_vector = await self.embeddings.aembed_query(query)
+            cached = self._result_cache.get(*cache_key, query_vector)
+            if cached is not None:
+                return cached
+
+        result: List[Document] | None
+        match retrieve_type:
+            case RetrieveType.DENSE:
+                result = cast(
+                    List[Document],
+                    await asyncio.to_thread(self._dense_retrieve, query, top_k, query_vector=query_vector),
+                )
+            case RetrieveType.BM25:
+                result = cast(List[Document] | None, await asyncio.to_thread(self._bm25_retrieve, query, top_k))
+            case RetrieveType.HYBRID:
+                result = await self._ahybrid_retrieve(
+                    query,
+                    top_k,
+                    dense_weight=params.dense_weight,
+                    sparse_weight=params.sparse_weight,
+                )
+            case _:
+                raise ValueError(f"Invalid retrieve method: {retrieve_type}")
+
+        result_s = [self._to_result(doc) for doc in result] if result else []
+        if cache_key is not None:
+            self._result_cache.put(*cache_key, query_vector, result_s)
+        return result_s
+
+    def _result_cache_key(self, params: SimpleChunkRetrieveParams) -> Tuple[Tuple, int] | None:
+        """
+        Return the namespace and the table version the retrieve result is cached under, or None if it is not cached.
+        Only the dense results are cached. The BM25 and hybrid results carry scores computed from the query text, a
+        similar query must not be served them.
+        """
+        if not self._result_cache.enabled or params.retrieve_mode != RetrieveType.DENSE:
+            return None
+        vector_db = cast(BaseVectorDataBase, self.db)
+        namespace = (
+            str(vector_db.db_type),
+            self.table_name,
+            self.identifier,
+            params.retrieve_mode,
+            params.top_k,
+        )
+        return namespace, vector_db.table_version(self.table_name)
 
     # def calculate_score(self, retrieve_type: RetrieveType, query: str, docs: List[Document]):
     #     match retrieve_type:
@@ -156,6 +357,14 @@ class SimpleChunk(
     #
     #     return docs
 
+    @staticmethod
+    def _to_result(doc: Document) -> Dict[str, Any]:
+        # the `identifier` column is internal to the table, it is not returned. the metadata is copied because the BM25
+        # retriever returns the cached documents.
+        metadata = dict(doc.metadata)
+        metadata.pop("identifier", None)
+        return {"metadata": metadata, "page_content": doc.page_content}
+
     def _get_table(self, db_obj: BaseDataBase) -> str:
         """
         Get table name in the vector database.
@@ -170,11 +379,9 @@ class SimpleChunk(
             f"db_obj must be an instance of BaseVectorDataBase, not {type(db_obj)}"
         )
 
-        table_name = f"{self.knowledge_name}__{self.type}__{self.embedding_model}"
-
-        table_name = table_name.replace("-", "_")
+        table_name = _make_table_name(self.knowledge_name, self.type, self.embedding_model)
 
-        if table_name not in db_obj.table_list():
+        if not db_obj.has_table(table_name):
             self.table_exist = False
         else:
             self.table_exist = True
@@ -184,86 +391,85 @@ class SimpleChunk(
     def _create_table(self):
         vector_db: BaseVectorDataBase = cast(BaseVectorDataBase, self.db)
 
-        if self.kwargs.get("schema"):
-            schema = self.kwargs["schema"]
-        else:
-            match vector_db.db_type:
-                case VectorDBType.LANCE:
-                    import pyarrow as pa
-
-                    schema = pa.schema(
-                        [
-                            pa.field("id", pa.utf8(), False),
-                            pa.field(
-                                "vector",
-                                pa.list_(pa.float64(), self.dimension),
-                                False,
-                            ),
-                            pa.field("text", pa.utf8(), False),
-                            pa.field(
-                                "metadata",
-                                pa.struct(
-                                    [
-                                        pa.field("source", pa.utf8(), False),
-                                    ]
-                                ),
-                                False,
-                            ),
-                        ]
-                    )
-                case VectorDBType.MILVUS:
-                    from pymilvus import CollectionSchema, FieldSchema, DataType
-
-                    id_field = FieldSchema(
-                        name="id",
-                        dtype=DataType.VARCHAR,
-                        max_length=256,
-                        is_primary=True,
-                    )
+        key = (str(vector_db.db_type), self.table_name)
+        with self._create_table_locks_lock:
+            lock = self._create_table_locks.setdefault(key, threading.Lock())
+
+        with lock:
+            # the table may have been created since the cached table list was fetched, e.g. by another request
+            if vector_db.has_table(self.table_name, refresh=True):
+                self.table_exist = True
+                return
+
+            if self.kwargs.get("schema"):
+                schema = self.kwargs["schema"]
+            else:
+                match vector_db.db_type:
+                    case VectorDBType.LANCE:
+                        schema = _lance_schema(self.dimension)
+                    case VectorDBType.MILVUS:
+                        schema = _milvus_schema(self.dimension)
+                    case _:
+                        raise ValueError(f"Unsupported vector database type: {vector_db.db_type}")
+            try:
+                vector_db.create_table(self.table_name, schema=schema)
+            except ValueError:
+                # another process may have created the table in between, the backends raise on an existing table
+                if not vector_db.has_table(self.table_name, refresh=True):
+                    raise
+            self.table_exist = True
 
-                    vector_field = FieldSchema(
-                        name="vector",
-                        dtype=DataType.FLOAT_VECTOR,
-                        dim=self.dimension,
-                    )
+    def _get_vectorstore(self, vector_db: BaseVectorDataBase, table_name: str) -> VectorStore:
+        """
+        Get the langchain vector store of the table. The vector store is cached, so the connection and the embeddings
+        wrapper are not rebuilt on every retrieval.
 
-                    text_field = FieldSchema(
-                        name="text",
-                        dtype=DataType.VARCHAR,
-                        max_length=65535,
-                    )
+        Args:
+            vector_db (BaseVectorDataBase): The vector database object.
+            table_name (str): The name of the table.
 
-                    metadata_field = FieldSchema(
-                        name="metadata",
-                        dtype=DataType.JSON,
-                    )
+        Returns:
+            VectorStore: The vector store object, langchain Milvus or LanceDB.
+        """
+        cache_key = (str(vector_db.db_type), table_name, self.embedding_model)
+        dense_vectorstore = self._vectorstore_cache.get(cache_key)
+        if dense_vectorstore is not None:
+            return dense_vectorstore
 
-                    identifier_field = FieldSchema(
-                        name="identifier",
-                        dtype=DataType.ARRAY,
-                        element_type=DataType.VARCHAR,
-                        max_length=65535,
-                        max_capacity=4096,
-                    )
+        match vector_db.db_type:
+            case VectorDBType.LANCE:
+                from langchain_community.vectorstores import LanceDB
 
-                    schema = CollectionSchema(
-                        fields=[
-                            id_field,
-                            vector_field,
-                            text_field,
-                            metadata_field,
-                            identifier_field,
-                        ],
-                    )
-                case _:
-                    raise ValueError(f"Unsupported vector database type: {vector_db.db_type}")
-        vector_db.create_table(self.table_name, schema=schema)
+                dense_vectorstore = LanceDB(
+                    connection=vector_db.connection,
+                    table_name=table_name,
+                    embedding=self.embeddings,
+                )
+            case VectorDBType.MILVUS:
+                from langchain_milvus import Milvus
+
+                dense_vectorstore = Milvus(
+                    embedding_function=self.embeddings,
+                    collection_name=table_name,
+                    connection_args={
+                        **setting.storage.milvus.model_dump(include={"uri", "user", "password"}),
+                        "db_name": setting.storage.milvus.db_name,
+                    },
+                    primary_field="id",
+                    metadata_field="metadata",
+                )
+            case _:
+                raise ValueError(f"Unsupported vector database type: {vector_db.db_type}")
+
+        self._vectorstore_cache[cache_key] = dense_vectorstore
+        return dense_vectorstore
 
     def _dense_retrieve(
         self,
         query: str,
         top_k: int = dfs_setting.retrieve.k,
         only_return_retriever=False,
+        query_vector: List[float] | None = None,
     ) -> VectorStoreRetriever | List[Document]:
         """
         Perform a dense retrieval of documents based on the query.
@@ -272,6 +478,8 @@ class SimpleChunk(
             query (str): The query string to search for.
             top_k (int, optional): The number of top results to return. Defaults to setting.retrieve.k.
             only_return_retriever (bool, optional): If True, only return the retriever object. Defaults to False.
+            query_vector (List[float] | None, optional): The embedding of the query if it is already computed, so the
+                query is not embedded again. Defaults to None.
 
         Returns:
             VectorStoreRetriever | List[Document]: The retriever object if only_return_retriever is True, otherwise a list of retrieved documents.
@@ -282,46 +490,62 @@ class SimpleChunk(
         )
 
         # Get the appropriate retriever based on the vector database type
-        dense_vectorstore: Milvus | LanceDB
-        match self.db.db_type:
-            case VectorDBType.LANCE:
-
-                dense_vectorstore = LanceDB(
-                    connection=vector_db.connection,
-                    table_name=table_name,
-                    embedding=self.embeddings,
-                )
-            case VectorDBType.MILVUS:
-                dense_vectorstore = Milvus(
-                    embedding_function=self.embeddings,
-                    collection_name=table_name,
-                    connection_args={
-                        **setting.storage.milvus.model_dump(include={"uri", "user", "password"}),
-                        "db_name": setting.storage.milvus.db_name,
-                    },
-                    primary_field="id",
-                    metadata_field="metadata",
-                )
-            case _:
-                raise ValueError(f"Unsupported vector database type: {self.db.db_type}")
+        dense_vectorstore = self._get_vectorstore(vector_db, table_name)
 
         if only_return_retriever:
             dense_retriever = dense_vectorstore.as_retriever()
-            dense_retriever.search_kwargs = {"expr": f'array_contains(identifier, "{self.identifier}")'}
+            dense_retriever.search_kwargs = {"expr": self._identifier_expr}
             return dense_retriever
 
         # Perform the similarity search and return the results
-        result: List[Tuple[Document, float]] = dense_vectorstore.similarity_search_with_relevance_scores(
-            query,
-            k=top_k,
-            expr=f'array_contains(identifier, "{self.identifier}")',
-        )
+        result: List[Tuple[Document, float]]
+        match vector_db.db_type:
+            case VectorDBType.MILVUS if query_vector is not None:
+                # the same as `similarity_search_with_relevance_scores`, with the query embedding given
+                relevance_score_fn = dense_vectorstore._select_relevance_score_fn()
+                result = [
+                    (doc, relevance_score_fn(score))
+                    for doc, score in cast(Any, dense_vectorstore).similarity_search_with_score_by_vector(
+                        query_vector, k=top_k, expr=self._identifier_expr
+                    )
+                ]
+            case _:
+                result = dense_vectorstore.similarity_search_with_relevance_scores(
+                    query,
+                    k=top_k,
+                    expr=self._identifier_expr,
+                )
 
         for doc, score in result:
             doc.metadata["dense_score"] = score
 
         return [doc for doc, _ in result]
 
+    @classmethod
+    def _put_bm25_cache(
+        cls, cache_key: Tuple[str, str, str], entry: Tuple[Any, float, BM25Retriever, Dict[str, List[str]]]
+    ):
+        """
+        Cache the BM25 index of a table. The expired indexes are dropped, and the least recently used ones beyond
+        setting.retrieve.bm25_cache_size.
+
+        Args:
+            cache_key (Tuple[str, str, str]): The database type, the table name and the identifier.
+            entry (Tuple[Any, float, BM25Retriever, Dict[str, List[str]]]): The table version, the build time, the
+                retriever and the tokens of the texts keyed by their md5.
+        """
+        now = time.monotonic()
+        with cls._bm25_cache_lock:
+            cls._bm25_cache[cache_key] = entry
+            cls._bm25_cache.move_to_end(cache_key)
+            expired_key_s = [
+                key for key, cached in cls._bm25_cache.items() if now - cached[1] >= dfs_setting.retrieve.bm25_cache_ttl
+            ]
+            for key in expired_key_s:
+                del cls._bm25_cache[key]
+            while len(cls._bm25_cache) > dfs_setting.retrieve.bm25_cache_size:
+                cls._bm25_cache.popitem(last=False)
+
     def _bm25_retrieve(
         self,
         query: str,
@@ -344,46 +568,76 @@ class SimpleChunk(
             f"db must be an instance of BaseVectorDataBase, not {type(vector_db)}"
         )
 
-        # get retriever
-        with vector_db.using(table_name) as table:
-            all_doc = table.query(
-                f"array_contains(identifier,'{self.identifier}')",
-                limit=-1,
-                output_fields=["id", "text", "metadata"],
-            )  # get all documents
-            if not all_doc:
-                return None
-
-            all_doc_df = pd.DataFrame(all_doc)
-            all_doc_s = (
-                all_doc_df[["id", "text", "metadata"]]
-                .apply(
-                    lambda x: Document(
-                        page_content=x["text"],
-                        metadata={**x["metadata"], "id": x["id"]},
-                    ),
-                    axis=1,
-                )
-                .tolist()
+        # get retriever. the retriever is rebuilt when the table has been written since it was cached, or when it is
+        # older than the ttl. the version only counts the writes of this process, the ttl bounds how long the writes of
+        # other processes are not seen.
+        cache_key = (str(vector_db.db_type), table_name, self.identifier)
+        table_version = vector_db.table_version(table_name)
+        with self._bm25_cache_lock:
+            cached = self._bm25_cache.get(cache_key)
+            if cached is not None:
+                self._bm25_cache.move_to_end(cache_key)
+        if (
+            cached is not None
+            and cached[0] == table_version
+            and time.monotonic() - cached[1] < dfs_setting.retrieve.bm25_cache_ttl
+        ):
+            cached_retriever, token_s = cached[2], cached[3]
+        else:
+            with vector_db.using(table_name) as table:
+                all_doc = table.query(
+                    self._identifier_expr,
+                    limit=-1,
+                    output_fields=["id", "text", "metadata"],
+                )  # get all documents
+                if not all_doc:
+                    with self._bm25_cache_lock:
+                        self._bm25_cache.pop(cache_key, None)
+                    return None
+
+                # build the documents from the rows in one pass, without going through a DataFrame
+                all_doc_s = [
+                    Document(page_content=row["text"], metadata={**row["metadata"], "id": row["id"]})
+                    for row in all_doc
+                ]
+
+            # the tokens are keyed by the md5 of the text, not by the id, which can be given in the metadata. only new
+            # texts are tokenized.
+            old_token_s = cached[3] if cached is not None else {}
+            text_key_s = [utils.calculate_md5(doc.page_content) for doc in all_doc_s]
+            token_s = {
+                text_key: old_token_s.get(text_key) or utils.split_multilingual(doc.page_content)
+                for text_key, doc in zip(text_key_s, all_doc_s)
+            }
+
+            cached_retriever = BM25Retriever(
+                vectorizer=BM25Okapi([token_s[text_key] for text_key in text_key_s]),
+                docs=all_doc_s,
+                preprocess_func=utils.split_multilingual,
             )
+            self._put_bm25_cache(cache_key, (table_version, time.monotonic(), cached_retriever, token_s))
 
-        sparse_retriever = BM25Retriever.from_documents(all_doc_s, preprocess_func=utils.split_multilingual)
-        sparse_retriever.k = top_k
+        # the cached retriever is shared between requests, set `k` on a shallow copy
+        sparse_retriever = cached_retriever.model_copy(update={"k": top_k})
 
         if only_return_retriever:
             return sparse_retriever
 
         # retrieve
-        result: List[Document] = sparse_retriever.invoke(query, expr=f'array_contains(identifier, "{self.identifier}")')
+        result: List[Document] = sparse_retriever.invoke(query, expr=self._identifier_expr)
 
         # calculate sparse retrieval score
-        corpus = list(map(lambda x: utils.split_multilingual(x.page_content), result))
+        corpus = [
+            token_s.get(utils.calculate_md5(doc.page_content)) or utils.split_multilingual(doc.page_content)
+            for doc in result
+        ]
         vectorizer = BM25Okapi(corpus)
         sparse_score_s = vectorizer.get_scores(utils.split_multilingual(query))
-        for score, doc in zip(sparse_score_s, result):
-            doc.metadata["sparse_score"] = score
-
-        return result
+        # the retriever returns its cached documents, the scores are set on copies so they do not leak to other calls
+        return [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, "sparse_score": score})
+            for score, doc in zip(sparse_score_s, result)
+        ]
 
     def _hybrid_retrieve(
         self,
@@ -393,7 +647,8 @@ class SimpleChunk(
         sparse_weight=dfs_setting.retrieve.weight.sparse,
     ) -> List[Document]:
         """
-        Perform a hybrid retrieval of documents based on the query.
+        Perform a hybrid retrieval of documents based on the query. The dense retrieval runs in a worker thread while
+        the sparse retrieval runs in the current one.
 
         Args:
             query (str): The query string to search for.
@@ -404,34 +659,88 @@ class SimpleChunk(
         Returns:
             List[Document]: A list of retrieved documents.
         """
-        dense_retriever = self._dense_retrieve(query, top_k, only_return_retriever=True)
-        sparse_retriever = self._bm25_retrieve(query, top_k, only_return_retriever=True)
+        dense_future = _hybrid_executor.submit(self._dense_retrieve, query, top_k)
+        sparse_result = cast(List[Document] | None, self._bm25_retrieve(query, top_k))
+        dense_result = cast(List[Document], dense_future.result())
 
-        dense_retriever = cast(VectorStoreRetriever, dense_retriever)
+        return self._fuse_hybrid_result(query, top_k, dense_result, sparse_result, dense_weight, sparse_weight)
 
+    async def _ahybrid_retrieve(
+        self,
+        query: str,
+        top_k: int = dfs_setting.retrieve.k,
+        dense_weight=dfs_setting.retrieve.weight.dense,
+        sparse_weight=dfs_setting.retrieve.weight.sparse,
+    ) -> List[Document]:
+        """
+        Asynchronously perform a hybrid retrieval of documents based on the query. The dense and sparse retrievals run
+        concurrently.
 
-        if sparse_retriever is None:
-            return []
+        Args:
+            query (str): The query string to search for.
+            top_k (int, optional): The number of top results to return. Defaults to setting.retrieve.k.
+            dense_weight (float, optional): The weight for dense retrieval. Defaults to setting.retrieve.weight.dense.
+            sparse_weight (float, optional): The weight for sparse retrieval. Defaults to setting.retrieve.weight.sparse.
 
-        # combine the all retrievers
-        ensemble_retriever = EnsembleRetriever(
-            retrievers=[dense_retriever, sparse_retriever],  # type: ignore
-            weights=[dense_weight, sparse_weight],
+        Returns:
+            List[Document]: A list of retrieved documents.
+        """
+        dense_result, sparse_result = await asyncio.gather(
+            asyncio.to_thread(self._dense_retrieve, query, top_k),
+            asyncio.to_thread(self._bm25_retrieve, query, top_k),
         )
 
-        ensemble_result: List[Document] = ensemble_retriever.invoke(
-            query, expr=f'array_contains(identifier, "{self.identifier}")'
-        )[:top_k]
-
-        # calculate dense retrieval score
-        dense_score_result: List[Tuple[Document, float]] = (
-            dense_retriever.vectorstore.similarity_search_with_relevance_scores(query)
+        return self._fuse_hybrid_result(
+            query,
+            top_k,
+            cast(List[Document], dense_result),
+            cast(List[Document] | None, sparse_result),
+            dense_weight,
+            sparse_weight,
         )
-        dense_score_mapping = {}
-        for doc, score in dense_score_result:
-            dense_score_mapping[doc.page_content] = score
+
+    @staticmethod
+    def _fuse_hybrid_result(
+        query: str,
+        top_k: int,
+        dense_result: List[Document],
+        sparse_result: List[Document] | None,
+        dense_weight: float,
+        sparse_weight: float,
+        c: int = 60,
+    ) -> List[Document]:
+        """
+        Combine the dense and sparse results with weighted Reciprocal Rank Fusion, the same as langchain
+        EnsembleRetriever. Documents are deduplicated by page_content.
+
+        Args:
+            query (str): The query string.
+            top_k (int): The number of top results to return.
+            dense_result (List[Document]): The ranked documents of dense retrieval, with `dense_score` in metadata.
+            sparse_result (List[Document] | None): The ranked documents of sparse retrieval.
+            dense_weight (float): The weight for dense retrieval.
+            sparse_weight (float): The weight for sparse retrieval.
+            c (int, optional): The constant added to the rank. Defaults to 60.
+
+        Returns:
+            List[Document]: The fused documents.
+        """
+        if sparse_result is None:
+            return []
+
+        rrf_score: Dict[str, float] = {}
+        unique_doc: Dict[str, Document] = {}
+        for doc_list, weight in ((dense_result, dense_weight), (sparse_result, sparse_weight)):
+            for rank, doc in enumerate(doc_list, start=1):
+                rrf_score[doc.page_content] = rrf_score.get(doc.page_content, 0.0) + weight / (rank + c)
+                unique_doc.setdefault(doc.page_content, doc)
+
+        # only the top_k are needed, a partial selection instead of sorting all candidates
+        ensemble_result = [unique_doc[content] for content in heapq.nlargest(top_k, rrf_score, key=rrf_score.get)]
+
+        # documents only hit by sparse retrieval have no dense score
         for doc in ensemble_result:
-            doc.metadata["dense_score"] = dense_score_mapping.get(doc.page_content, 0)
+            doc.metadata.setdefault("dense_score", 0)
 
         # calculate sparse retrieval score
         corpus = list(map(lambda x: utils.split_multilingual(x.page_content), ensemble_result))
@@ -442,11 +751,50 @@ class SimpleChunk(
 
         return ensemble_result
 
+    @staticmethod
+    def _query_by_id_s(
+        table: BaseVectorDataBase, id_s: List[str], output_fields: List[str], batch_size: int = 1024
+    ) -> List[Dict[str, Any]]:
+        """
+        Query the rows of the ids from the table. The ids are queried in batches to keep the filter expression short.
+
+        Args:
+            table (BaseVectorDataBase): The database with the table in use.
+            id_s (List[str]): The ids to query.
+            output_fields (List[str]): The fields to fetch.
+            batch_size (int, optional): The number of ids in one query. Defaults to 1024.
+
+        Returns:
+            List[Dict[str, Any]]: The rows found in the table.
+        """
+        row_s = []
+        unique_id_s = list(dict.fromkeys(id_s))
+        for i in range(0, len(unique_id_s), batch_size):
+            batch_id_s = unique_id_s[i : i + batch_size]
+            row_s += table.query(
+                f"id in {json.dumps(batch_id_s, ensure_ascii=False)}", output_fields=output_fields, limit=-1
+            )
+        return row_s
+
+    def _exist_id_s(self, table: BaseVectorDataBase, id_s: List[str]) -> set[str]:
+        """
+        Find which of the ids already exist in the table. Only the id field is fetched.
+
+        Args:
+            table (BaseVectorDataBase): The database with the table in use.
+            id_s (List[str]): The ids to check.
+
+        Returns:
+            set[str]: The ids that exist in the table.
+        """
+        return {row["id"] for row in self._query_by_id_s(table, id_s, ["id"])}
+
     def index(
         self,
         params: SimpleChunkIndexParams,
         chunk_size: int = dfs_setting.index.chunk_size,
         chunk_overlap: int = dfs_setting.index.overlap_size,
+        write_batch_size: int = dfs_setting.index.write_batch_size,
     ):
         """
         Build index from source data and store to database.
@@ -455,6 +803,8 @@ class SimpleChunk(
             params (SimpleChunkIndexParams): The index parameters.
             chunk_size (int, optional): The size of each chunk. Defaults to setting.index.chunk_size.
             chunk_overlap (int, optional): The overlap size between chunks. Defaults to setting.index.overlap_size.
+            write_batch_size (int, optional): The number of chunks embedded and written in one batch. Defaults to
+                setting.index.write_batch_size.
         """
         if not self.table_exist:
             self._create_table()
@@ -467,29 +817,67 @@ class SimpleChunk(
             source_docs = source_data
 
         # split the document into chunks
-        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        splitter = _get_splitter(chunk_size, chunk_overlap)
 
         indexed_data = splitter.split_documents(source_docs)
 
-        # handle image
-        img_params: StoreImageParams = StoreImageParams(**params.model_dump())
+        # handle image. the params are built from the validated fields, a dump would copy the whole source data
+        img_params: StoreImageParams = utils.construct_from(StoreImageParams, params)
         if img_params.image and img_params.img_desc:
-            oss_store_params = OSSStoreInitParams(**img_params.model_dump())
+            oss_store_params = utils.construct_from(OSSStoreInitParams, img_params)
             img_doc: Document = OSSStore(params=oss_store_params).store_image(img_params)
             indexed_data.append(img_doc)  # add image description to indexed_data
 
         # store index
 
         # detects whether the metadata has an id field. If not, it will be generated id based on page_content via md5 algorithm.
-        id_s = [doc.metadata.get("id", utils.calculate_md5(doc.page_content)) for doc in indexed_data]
+        # `dict.get` would evaluate the default eagerly, only hash the chunks without an id.
+        id_s = [
+            doc.metadata["id"] if "id" in doc.metadata else utils.calculate_md5(doc.page_content)
+            for doc in indexed_data
+        ]
 
-        text_vector_s = self.embeddings.embed_documents([_.page_content for _ in indexed_data])
-
-        data = []
+        vector_db, table_name = self.db, self.table_name
+        assert isinstance(vector_db, BaseVectorDataBase), (
+            f"db must be an instance of BaseVectorDataBase, not {type(vector_db)}"
+        )
 
-        for id_, vector, doc in zip(id_s, text_vector_s, indexed_data):
+        if mode == DBMode.INSERT:
+            # only insert the chunks whose id is not in the table yet, and skip embedding the others.
+            with vector_db.using(table_name) as table:
+                exist_id_s = self._exist_id_s(table, id_s)
+            new_id_s, new_indexed_data = [], []
+            for id_, doc in zip(id_s, indexed_data):
+                if id_ not in exist_id_s:
+                    exist_id_s.add(id_)  # also de-duplicate the chunks in this batch
+                    new_id_s.append(id_)
+                    new_indexed_data.append(doc)
+            id_s, indexed_data = new_id_s, new_indexed_data
+            if not indexed_data:
+                return
+
+        for doc in indexed_data:
             doc.metadata.update(params.metadata)  # update metadata with params.metadata
-            data.append(
+
+        def build_data(
+            table: BaseVectorDataBase, batch_id_s: List[str], batch_doc_s: List[Document]
+        ) -> List[Dict[str, Any]]:
+            # in UPSERT mode, the chunks already stored with the same text reuse the stored vector, only the others are
+            # embedded. the text is compared because an id given in the metadata does not have to be the content hash.
+            stored_vector_s: Dict[str, List[float]] = {}
+            if mode == DBMode.UPSERT:
+                doc_text_s = {id_: doc.page_content for id_, doc in zip(batch_id_s, batch_doc_s)}
+                stored_vector_s = {
+                    row["id"]: row["vector"]
+                    for row in self._query_by_id_s(table, batch_id_s, ["id", "text", "vector"])
+                    if row["text"] == doc_text_s.get(row["id"])
+                }
+            embed_doc_s = [doc for id_, doc in zip(batch_id_s, batch_doc_s) if id_ not in stored_vector_s]
+            embed_vector_s = iter(self.embeddings.embed_documents([_.page_content for _ in embed_doc_s]))
+            text_vector_s = [
+                stored_vector_s[id_] if id_ in stored_vector_s else next(embed_vector_s) for id_ in batch_id_s
+            ]
+            return [
                 {
                     "id": id_,
                     "vector": vector,
@@ -497,25 +885,40 @@ class SimpleChunk(
                     "metadata": doc.metadata,
                     "identifier": [self.identifier],
                 }
-            )
-
-        vector_db, table_name = self.db, self.table_name
-        assert isinstance(vector_db, BaseVectorDataBase), (
-            f"db must be an instance of BaseVectorDataBase, not {type(vector_db)}"
-        )
-
-        with vector_db.using(table_name) as table:
-            match mode:
-                case DBMode.INSERT:
-                    table.add(data)
-
-                case DBMode.UPSERT:
-                    table.upsert(data)
-
-                case DBMode.OVERWRITE:
-                    table.overwrite(data)
-                case _:
-                    raise ValueError(f"Invalid mode: {mode}")
+                for id_, vector, doc in zip(batch_id_s, text_vector_s, batch_doc_s)
+            ]
+
+        # an empty source still yields one (empty) batch, so OVERWRITE truncates the table as before.
+        batch_s = [
+            (id_s[i : i + write_batch_size], indexed_data[i : i + write_batch_size])
+            for i in range(0, max(len(indexed_data), 1), write_batch_size)
+        ]
+        if mode == DBMode.OVERWRITE:
+            # every batch is embedded before the table is truncated, so a failed embedding keeps the stored data
+            with vector_db.using(table_name) as table:
+                data_s = [build_data(table, *batch) for batch in batch_s]
+                table.overwrite(data_s[0])
+                for data in data_s[1:]:
+                    table.insert(data)
+        else:
+            # embed the next batch while the current one is written
+            with ThreadPoolExecutor(max_workers=1) as executor, vector_db.using(table_name) as table:
+                future = executor.submit(build_data, table, *batch_s[0])
+                for batch_idx in range(len(batch_s)):
+                    data = future.result()
+                    if batch_idx + 1 < len(batch_s):
+                        future = executor.submit(build_data, table, *batch_s[batch_idx + 1])
+
+                    match mode:
+                        case DBMode.INSERT:
+                            table.insert(data)
+
+                        case DBMode.UPSERT:
+                            table.upsert(data)
+                        case _:
+                            raise ValueError(f"Invalid mode: {mode}")
+
+        vector_db.ensure_index(table_name)
 
     def generate(self, params: SimpleChunkGenerateParams):
         return NotImplemented
@@ -1,5 +1,5 @@
 from fastapi import status, Response
-from starlette.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
 from aa_rag.gtypes.models.base import BaseResponse
 
@@ -17,7 +17,7 @@ async def handle_exception_error(request, exc):
     response = Response()
     response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=response.status_code,
         content=BaseResponse(
             response=response,
@@ -39,7 +39,7 @@ async def handel_file_not_found_error(request, exc):
     response = Response()
     response.status_code = status.HTTP_404_NOT_FOUND
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=response.status_code,
         content=BaseResponse(
             response=response,
@@ -37,6 +37,7 @@ class VectorDBType(Enum):
 class NoSQLDBType(Enum):
     TINYDB = "tinydb"
     MONGODB = "mongodb"
+    SQLITE = "sqlite"
 
     def __str__(self):
         return f"{self.value}"
@@ -1,6 +1,6 @@
-from typing import Any, Optional, List
+from typing import Any, Optional, List, Dict
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
 
 from aa_rag.gtypes.models.base import BaseResponse
 from aa_rag.gtypes.models.knowlege_base.base import BaseKnowledgeItem
@@ -18,6 +18,14 @@ class Guide(BaseModel):
     procedure: str = Field(..., description="The detailed deployment process of the guide")
     compatible_env: CompatibleEnv = Field(..., description="The compatible environment of the guide")
 
+    # the stored record the guide was loaded from, written back as is while the guide is unchanged
+    _stored_record: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self._stored_record = None
+
 
 class Project(BaseModel):
     name: str = Field(..., description="Project name")
@@ -1,5 +1,4 @@
-from os import PathLike
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import Field
 
@@ -8,12 +7,13 @@ from aa_rag.oss import OSSStoreInitParams
 
 
 class ParserNeedItem(OSSStoreInitParams):
-    file_path: Optional[PathLike] = Field(
+    file_path: Optional[str | List[str]] = Field(
         default=None,
         examples=[
             "user_manual/call_llm.md",
+            ["user_manual/call_llm.md", "user_manual/call_embedding.md"],
         ],
-        description="Path to the file to be indexed. The file can from local file or OSS. Attention: The file_path and content cannot be both None.",
+        description="Path or list of paths to the files to be indexed. The files can from local file or OSS, a list is parsed concurrently and indexed in one batch. Attention: The file_path and content cannot be both None.",
     )
 
     content: Optional[str] = Field(
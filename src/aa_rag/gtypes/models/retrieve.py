@@ -36,11 +36,9 @@ class RetrieveResponse(BaseResponse):
 
     @field_validator("data")
     def validate(cls, v):
-        doc_s = [doc.model_dump(include={"metadata", "page_content"}) for doc in v]
+        doc_s = [{"metadata": dict(doc.metadata), "page_content": doc.page_content} for doc in v]
 
-        for doc in v:
-            if "metadata" in doc:
-                if "identifier" in doc["metadata"]:
-                    doc.pop("identifier")
+        for doc in doc_s:
+            doc["metadata"].pop("identifier", None)
 
         return doc_s
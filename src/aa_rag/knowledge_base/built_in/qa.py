@@ -1,5 +1,7 @@
-from typing import List, Any, Dict
+from functools import lru_cache
+from typing import List, Any, Dict, Tuple
 
+import orjson
 from langchain_core.documents import Document
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
@@ -15,6 +17,85 @@ from aa_rag.gtypes.enums import VectorDBType
 from aa_rag.knowledge_base.base import BaseKnowledge
 
 
+# the prompt to filter out the retrieved QA that are obviously unrelated to the query, parsed once at import
+_QA_FILTER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a helpful assistant. I will provide you with a query question and some retrieved documents. Identify retrieved documents that are obviously not related to the query question.
+            --Explains--
+            1. The query question and documents should be in a json format. 
+            2. The query question should be in the "query" field and the documents should be in the "documents" field.
+            3. The "documents" field should be in a list format. Each document should have an "id" field, an "error_desc" field.
+            
+            --Steps--
+            1. Identify the languages for query question and documents.error_desc.
+            2. Use the language of documents.error_desc to translate the query question if the languages are different. 
+            3. Use the translated query question to judge the retrieved document whether related to query question obviously based on "error_desc" field.
+            2. If you think have found the document that obviously unrelated retrieved documents, please return the "id" field of the document.
+            3. Do not return other information except the "id" field or language.
+            4. Please strictly follow the steps.
+            
+            
+            --Example 1--
+            -Input-
+            {{"query":"代理错误","documents":[{{"id":"1","error_desc":"网络错误，无法连接 google"}},{{"id":"2","error_desc":"windows ping不通 https://www.baidu.com"}}]}}
+            
+            -Output-
+            {{"id":[],"language":{{"query":"zh","error_desc":"zh"}}}}
+            
+            --Example 2--
+            -Input-
+            {{"query":"红烧肉太甜了","documents":[{{"id":"1","error_desc":"网络错误，无法连接 google"}},{{"id":"2","error_desc":"windows ping不通 https://www.baidu.com"}}]}}
+            
+            -Output-
+            {{"id":["1","2"],"language":{{"query":"zh","error_desc":"zh"}}}}
+            
+            --Example 3--
+            -Input-
+            {{"query":"proxy is error caused can not to navigate network?","documents":[{{"id":"1","error_desc":"网络错误，无法连接 google"}},{{"id":"2","error_desc":"windows ping不通 https://www.baidu.com"}}]}}
+            
+            -Output-
+            {{"id":[],"language":{{"query":"en","error_desc":"zh"}}}}
+            
+            --Real--
+            -Input-
+            {info_json}
+            
+            -Output-
+            
+            """,
+        )
+    ]
+)
+
+
+@lru_cache(maxsize=32)
+def _build_qa_schema(dimensions: int):
+    """
+    Build the LanceDB table schema of the QA knowledge base. The schema is immutable, so it is built once per dimension.
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            pa.field("id", pa.utf8(), False),
+            pa.field("vector", pa.list_(pa.float32(), dimensions), False),
+            pa.field("text", pa.utf8(), False),
+            pa.field(
+                "metadata",
+                pa.struct(
+                    [
+                        pa.field("solution", pa.utf8(), False),
+                        pa.field("tags", pa.list_(pa.utf8()), False),
+                    ]
+                ),
+                False,
+            ),
+        ]
+    )
+
+
 class QAKnowledge(BaseKnowledge):
     def __init__(
         self,
@@ -28,25 +109,7 @@ class QAKnowledge(BaseKnowledge):
 
         # define table schema
         if vector_db == VectorDBType.LANCE:
-            import pyarrow as pa
-
-            schema = pa.schema(
-                [
-                    pa.field("id", pa.utf8(), False),
-                    pa.field("vector", pa.list_(pa.float64(), self.dimensions), False),
-                    pa.field("text", pa.utf8(), False),
-                    pa.field(
-                        "metadata",
-                        pa.struct(
-                            [
-                                pa.field("solution", pa.utf8(), False),
-                                pa.field("tags", pa.list_(pa.utf8()), False),
-                            ]
-                        ),
-                        False,
-                    ),
-                ]
-            )
+            schema = _build_qa_schema(self.dimensions)
         else:
             schema = None
 
@@ -56,6 +119,7 @@ class QAKnowledge(BaseKnowledge):
             schema=schema,
         )
         self.db = vector_db
+        self._filter_chain = _QA_FILTER_PROMPT | self.llm | JsonOutputParser()
 
     @property
     def knowledge_name(self):
@@ -72,20 +136,38 @@ class QAKnowledge(BaseKnowledge):
         # check if the project is already indexed
         """
 
+        self.batch_index([(error_desc, error_solution, tags)], **kwargs)
+
+    def batch_index(self, qa_s: List[Tuple[str, str, List[str]]], **kwargs):
+        """
+        Index a batch of QA information with one call of the engine, so the error descriptions are embedded and
+        written together.
+        Args:
+            qa_s: The list of (error description, solution, tags) of the QA.
+            **kwargs:
+        """
+        if not qa_s:
+            return
+
         chunk_size = (
-            len(error_desc) * 2 if kwargs.get("chunk_size") is None else kwargs.get("chunk_size")
+            max(len(error_desc) for error_desc, _, _ in qa_s) * 2
+            if kwargs.get("chunk_size") is None
+            else kwargs.get("chunk_size")
         )  # ensure the chunk size is large enough to cover the whole text. do not split the text.
         chunk_overlap = 0 if kwargs.get("chunk_overlap") is None else kwargs.get("chunk_overlap")
 
         self.engine.index(
             params=SimpleChunkIndexParams(
-                source_data=Document(
-                    page_content=error_desc,
-                    metadata={"solution": error_solution, "tags": tags},
-                ),
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
-            )
+                source_data=[
+                    Document(
+                        page_content=error_desc,
+                        metadata={"solution": error_solution, "tags": tags},
+                    )
+                    for error_desc, error_solution, tags in qa_s
+                ],
+            ),
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
         )
 
     def retrieve(self, error_desc: str, tags: List[str] | None = None) -> List[Any]:
@@ -99,75 +181,24 @@ class QAKnowledge(BaseKnowledge):
         """
         result = self.engine.retrieve(SimpleChunkRetrieveParams(query=error_desc))
 
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """You are a helpful assistant. I will provide you with a query question and some retrieved documents. Identify retrieved documents that are obviously not related to the query question.
-                    --Explains--
-                    1. The query question and documents should be in a json format. 
-                    2. The query question should be in the "query" field and the documents should be in the "documents" field.
-                    3. The "documents" field should be in a list format. Each document should have an "id" field, an "error_desc" field.
-                    
-                    --Steps--
-                    1. Identify the languages for query question and documents.error_desc.
-                    2. Use the language of documents.error_desc to translate the query question if the languages are different. 
-                    3. Use the translated query question to judge the retrieved document whether related to query question obviously based on "error_desc" field.
-                    2. If you think have found the document that obviously unrelated retrieved documents, please return the "id" field of the document.
-                    3. Do not return other information except the "id" field or language.
-                    4. Please strictly follow the steps.
-                    
-                    
-                    --Example 1--
-                    -Input-
-                    {{"query":"代理错误","documents":[{{"id":"1","error_desc":"网络错误，无法连接 google"}},{{"id":"2","error_desc":"windows ping不通 https://www.baidu.com"}}]}}
-                    
-                    -Output-
-                    {{"id":[],"language":{{"query":"zh","error_desc":"zh"}}}}
-                    
-                    --Example 2--
-                    -Input-
-                    {{"query":"红烧肉太甜了","documents":[{{"id":"1","error_desc":"网络错误，无法连接 google"}},{{"id":"2","error_desc":"windows ping不通 https://www.baidu.com"}}]}}
-                    
-                    -Output-
-                    {{"id":["1","2"],"language":{{"query":"zh","error_desc":"zh"}}}}
-                    
-                    --Example 3--
-                    -Input-
-                    {{"query":"proxy is error caused can not to navigate network?","documents":[{{"id":"1","error_desc":"网络错误，无法连接 google"}},{{"id":"2","error_desc":"windows ping不通 https://www.baidu.com"}}]}}
-                    
-                    -Output-
-                    {{"id":[],"language":{{"query":"en","error_desc":"zh"}}}}
-                    
-                    --Real--
-                    -Input-
-                    {info_json}
-                    
-                    -Output-
-                    
-                    """,
-                )
-            ]
-        )
+        if not result:
+            return []
 
-        info_dict: Dict[str, Any] = dict()
-        info_dict["query"] = error_desc
-        info_dict["documents"] = list()
-        for id_, each_result in enumerate(result):
-            info_dict["documents"].append(
+        id_s = [str(_) for _ in range(len(result))]
+        info_dict: Dict[str, Any] = {
+            "query": error_desc,
+            "documents": [
                 {
-                    "id": str(id_),
+                    "id": id_,
                     "error_desc": each_result["page_content"],
                     # "tags": each_result["metadata"]["tags"],
                 }
-            )
-
-        chain = prompt_template | self.llm | JsonOutputParser()
+                for id_, each_result in zip(id_s, result)
+            ],
+        }
 
-        hit_doc_id_s = chain.invoke({"info_json": info_dict})
+        # render the input as compact JSON, which the prompt describes
+        hit_doc_id_s = self._filter_chain.invoke({"info_json": orjson.dumps(info_dict).decode()})
 
-        final_result = []
-        for id_, each_result in enumerate(result):
-            if str(id_) not in hit_doc_id_s.get("id", []):
-                final_result.append(each_result)
-        return final_result
+        unrelated_id_s = set(hit_doc_id_s.get("id", []))
+        return [each_result for id_, each_result in zip(id_s, result) if id_ not in unrelated_id_s]
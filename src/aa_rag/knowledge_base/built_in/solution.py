@@ -1,6 +1,8 @@
-import ast
-from typing import Dict, Any, List
+import re
+import threading
+from typing import Dict, Any, List, Tuple
 
+import orjson
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -15,7 +17,66 @@ from aa_rag.gtypes.models.knowlege_base.solution import (
 from aa_rag.knowledge_base.base import BaseKnowledge
 
 
+# the prompts are parsed once at import, the chains are built once per knowledge base object
+_FIND_COMPATIBLE_GUIDE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are an expert in computer hardware device information. I will provide you with a json of the detailed data of a computer hardware device information, and a json list of candidate devices with their ids. Please find the first candidate device that is compatible with the device.
+            --Requirements--
+            1. Please determine whether each candidate device environment is compatible with the device environment when i install a software in each devices. Return the id of the first compatible candidate in the list. If no candidate is compatible, return -1.
+            2. Different operating system platform are not compatible.
+            3. Different CPU architecture are not compatible.
+            4. Please compare the platform and architecture of the devices and strictly judge according to my requirements.
+            5. Do not return other information. Just return the id according to the requirements.
+            
+            
+            --Example--
+            -Input-
+            env_info: {{"platform": "darwin","arch": "m2"}}
+            candidate_env_infos: [{{"id": 0, "env": {{"platform": "windows","arch": "x64"}}}}, {{"id": 1, "env": {{"platform": "darwin","arch": "m3"}}}}]
+            
+            -Output-
+            1
+            
+            
+            --Real Data--
+            -Input-
+            env_info: {env_info}
+            candidate_env_infos: {candidate_env_infos}
+            
+            -Output-
+            """,
+        )
+    ]
+)
+
+_MERGE_PROCEDURE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """Merge the source procedure with the target procedure.
+            --Requirements--
+            1. The merged procedure should be in a MarkDown format.
+            2. Just return the merged procedure. Do not return other information.
+            --Data--
+            source_procedure: {source_procedure}
+            target_procedure: {target_procedure}
+            --Result--
+            merged_procedure:
+            """,
+        )
+    ]
+)
+
+
 class SolutionKnowledge(BaseKnowledge):
+    # index reads a project, merges the new guide into it and writes it back. the requests run in worker threads, so
+    # the read-modify-write of one project is serialized, otherwise concurrent requests lose updates or add the same
+    # guide twice. the locks only guard the threads of this process.
+    _project_locks: Dict[Tuple[str, str], threading.Lock] = {}
+    _project_locks_lock = threading.Lock()
+
     @property
     def knowledge_name(self):
         return "Solution"
@@ -31,72 +92,54 @@ class SolutionKnowledge(BaseKnowledge):
         super().__init__(**kwargs)
         self.nosql_db: BaseNoSQLDataBase = utils.get_db(nosql_db)
         self.table_name = self.knowledge_name.lower()
+        self._find_compatible_guide_chain = _FIND_COMPATIBLE_GUIDE_PROMPT | self.llm | StrOutputParser()
+        self._merge_procedure_chain = _MERGE_PROCEDURE_PROMPT | self.llm | StrOutputParser()
 
-    def _is_compatible_env(self, source_env_info: CompatibleEnv, target_env_info: CompatibleEnv) -> bool:
+    def _find_compatible_guide(self, env_info: CompatibleEnv, guides: List[Guide]) -> Guide | None:
         """
-        Determine if source_env_info is compatible with target_env_info.
+        Find the first guide that is compatible with env_info. All the guides are checked in a single LLM request.
 
         Args:
-            source_env_info (CompatibleEnv): The source environment information.
-            target_env_info (CompatibleEnv): The target environment information.
+            env_info (CompatibleEnv): The environment information.
+            guides (List[Guide]): The guides to check.
 
         Returns:
-            bool: True if compatible, False otherwise.
-        """
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """You are an expert in computer hardware device information. I will provide you with two jsons. Each json is the detailed data of a computer hardware device information. Please determine whether the two devices are compatible.
-                    --Requirements--
-                    1. Please determine whether the two device environments are compatible when i install a software in each devices. If compatible, please return "True". Otherwise, return "False".
-                    2. Different operating system platform are not compatible.
-                    3. Different CPU architecture are not compatible.
-                    4. Please compare the platform and architecture of the two devices and strictly judge according to my requirements.
-                    5. Do not return other information. Just return "True" or "False" according to the requirements.
-                    
-                    
-                    --Example 1--
-                    -Input-
-                    source_env_info: {{"platform": "windows","arch": "x64"}}
-                    target_env_info: {{"platform": "darwin","arch": "arm64"}}
-                    
-                    -Output- 
-                    False
-                    
-                    --Example 2--
-                    -Input-
-                    source_env_info: {{"platform": "darwin","arch": "m2"}}
-                    target_env_info: {{"platform": "darwin","arch": "m3"}}
-                    
-                    -Output-
-                    True
-                    
-                    
-                    --Real Data--
-                    -Input-
-                    source_env_info: {source_env_info}
-                    target_env_info: {target_env_info}
-                    
-                    -Output-
-                    """,
-                )
-            ]
-        )
+            Guide | None: The first compatible guide if found, None otherwise.
+        """
+        if not guides:
+            return None
 
-        chain = prompt_template | self.llm | StrOutputParser()
-        result = chain.invoke(
+        candidate_s = [
+            {"id": idx, "env": guide.compatible_env.model_dump(exclude_none=True)} for idx, guide in enumerate(guides)
+        ]
+        result: str = self._find_compatible_guide_chain.invoke(
             {
-                "source_env_info": source_env_info.model_dump(),
-                "target_env_info": target_env_info.model_dump(),
+                "env_info": env_info.model_dump_json(exclude_none=True),
+                "candidate_env_infos": orjson.dumps(candidate_s).decode(),
             }
         )
-        try:
-            # result=bool(result)
-            result = ast.literal_eval(result)
-        except Exception:
-            result = False
-        return result
+
+        idx = self._parse_guide_index(result, len(guides))
+        return None if idx is None else guides[idx]
+
+    @staticmethod
+    def _parse_guide_index(result: str, guide_count: int) -> int | None:
+        """
+        Parse the index of the compatible guide returned by the LLM. Only a bare integer in the range of the guides is
+        accepted, anything else, including -1, means no compatible guide.
+
+        Args:
+            result (str): The LLM output.
+            guide_count (int): The number of guides.
+
+        Returns:
+            int | None: The index of the guide, or None if there is no compatible guide.
+        """
+        result = result.strip()
+        if not re.fullmatch(r"-?[0-9]+", result):
+            return None
+        idx = int(result)
+        return idx if 0 <= idx < guide_count else None
 
     def _get_project_in_db(self, project_meta: Dict[str, Any]) -> Project | None:
         """
@@ -114,13 +157,15 @@ class SolutionKnowledge(BaseKnowledge):
         if records:
             record = records[0]
             guides_data: List[Dict[str, Any]] = record.get("guides", [])
-            guides: List[Guide] = [
-                Guide(
+            # the guides were validated before they were written, so they are built without validation
+            guides: List[Guide] = []
+            for item in guides_data:
+                guide = Guide.model_construct(
                     procedure=item["procedure"],
-                    compatible_env=CompatibleEnv(**item["compatible_env"]),
+                    compatible_env=CompatibleEnv.model_construct(**item["compatible_env"]),
                 )
-                for item in guides_data
-            ]
+                guide._stored_record = item
+                guides.append(guide)
             project_id = record.get("project_id", None)
             record_project_meta = record.get("project_meta", {})
             record_project_meta.update(project_meta)
@@ -130,7 +175,7 @@ class SolutionKnowledge(BaseKnowledge):
 
     def _project_to_db(self, project: Project) -> int:
         """
-        Save a project to TinyDB. Insert if project.id is None, otherwise update.
+        Save a project to TinyDB with a single upsert. A project without id is given a new one and inserted.
 
         Args:
             project (Project): The project to save.
@@ -138,20 +183,36 @@ class SolutionKnowledge(BaseKnowledge):
         Returns:
             int: 1 indicating success.
         """
+        project_meta = project.model_dump(exclude={"guides", "id"})
+        project_id = project.id or utils.get_uuid()
         record = {
-            "guides": [guide.model_dump() for guide in project.guides],
-            "project_meta": project.model_dump(exclude={"guides", "id"}),
-            "name": project.model_dump(exclude={"guides", "id"}).get("name"),
+            # only the new and changed guides are dumped again
+            "guides": [
+                guide.model_dump() if guide._stored_record is None else guide._stored_record for guide in project.guides
+            ],
+            "project_meta": project_meta,
+            "name": project_meta.get("name"),
+            "project_id": project_id,
         }
         with self.nosql_db.using(self.table_name) as table:
-            if project.id is None:
-                project_id = utils.get_uuid()
-                record["project_id"] = project_id
-                table.insert(record)
-            else:
-                table.update(record, query={"project_id": project.id})
+            table.upsert(record, query={"project_id": project_id})
+        project.id = project_id
         return 1
 
+    def _project_lock(self, project_meta: Dict[str, Any]) -> threading.Lock:
+        """
+        Return the lock of a project. The projects are looked up by name, so the lock is keyed by it.
+
+        Args:
+            project_meta (Dict[str, Any]): The project metadata.
+
+        Returns:
+            threading.Lock: The lock of the project.
+        """
+        key = (self.table_name, project_meta["name"])
+        with self._project_locks_lock:
+            return self._project_locks.setdefault(key, threading.Lock())
+
     def _merge_procedure(self, source_procedure: str, target_procedure: str) -> str:
         """
         Merge source_procedure with target_procedure and return the merged procedure in MarkDown format.
@@ -163,26 +224,7 @@ class SolutionKnowledge(BaseKnowledge):
         Returns:
             str: The merged procedure in MarkDown format.
         """
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """Merge the source procedure with the target procedure.
-                    --Requirements--
-                    1. The merged procedure should be in a MarkDown format.
-                    2. Just return the merged procedure. Do not return other information.
-                    --Data--
-                    source_procedure: {source_procedure}
-                    target_procedure: {target_procedure}
-                    --Result--
-                    merged_procedure:
-                    """,
-                )
-            ]
-        )
-
-        chain = prompt_template | self.llm | StrOutputParser()
-        result: str = chain.invoke(
+        result: str = self._merge_procedure_chain.invoke(
             {
                 "source_procedure": source_procedure,
                 "target_procedure": target_procedure,
@@ -210,22 +252,21 @@ class SolutionKnowledge(BaseKnowledge):
         """
         env_info_obj = CompatibleEnv(**env_info)
 
-        project = self._get_project_in_db(project_meta)
-        if project:
-            for guide in project.guides:
-                is_compatible: bool = self._is_compatible_env(env_info_obj, guide.compatible_env)
-                if is_compatible:
+        with self._project_lock(project_meta):
+            project = self._get_project_in_db(project_meta)
+            if project:
+                guide = self._find_compatible_guide(env_info_obj, project.guides)
+                if guide:
                     merged_procedure = self._merge_procedure(guide.procedure, procedure)
                     guide.procedure = merged_procedure
-                    break
+                else:
+                    guide = Guide(procedure=procedure, compatible_env=env_info_obj)
+                    project.guides.append(guide)
             else:
                 guide = Guide(procedure=procedure, compatible_env=env_info_obj)
-                project.guides.append(guide)
-        else:
-            guide = Guide(procedure=procedure, compatible_env=env_info_obj)
-            project = Project(guides=[guide], **project_meta)
+                project = Project(guides=[guide], **project_meta)
 
-        return self._project_to_db(project)
+            return self._project_to_db(project)
 
     def retrieve(self, env_info: Dict[str, Any], project_meta: Dict[str, Any]) -> Guide | None:
         """
@@ -241,8 +282,5 @@ class SolutionKnowledge(BaseKnowledge):
         env_info_obj = CompatibleEnv(**env_info)
         project = self._get_project_in_db(project_meta)
         if project:
-            for guide in project.guides:
-                is_compatible: bool = self._is_compatible_env(env_info_obj, guide.compatible_env)
-                if is_compatible:
-                    return guide
+            return self._find_compatible_guide(env_info_obj, project.guides)
         return None
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastmcp import FastMCP
 
 from aa_rag import setting
@@ -8,7 +9,7 @@ from aa_rag.exceptions import (
 )
 from aa_rag.router import qa, solution, index, retrieve, statistic, delete
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.include_router(qa.router)
 app.include_router(solution.router)
 app.include_router(index.router)
@@ -26,7 +27,8 @@ async def root():
 
 @app.get("/default")
 async def default():
-    return setting.model_dump()
+    # dumped in json mode by pydantic-core, secrets masked, and returned as is instead of walked by jsonable_encoder
+    return ORJSONResponse(setting.model_dump(mode="json"))
 
 
 def startup():
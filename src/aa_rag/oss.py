@@ -1,4 +1,7 @@
 import logging
+import threading
+import time
+from collections import OrderedDict
 from os import PathLike
 from pathlib import Path
 from typing import Tuple, Optional
@@ -9,6 +12,10 @@ from pydantic import BaseModel, Field, HttpUrl, model_validator
 
 from aa_rag import setting, utils
 
+# the bucket prefixes of the object paths, built once instead of per validated resource info
+_BUCKET_PREFIX = f"{setting.oss.bucket}/"
+_CACHE_BUCKET_PREFIX = f"{setting.oss.cache_bucket}/"
+
 
 class OSSStoreInitParams(BaseModel):
     use_cache: bool = Field(default=True, examples=[True], description="Whether to use OSS cache.")
@@ -29,6 +36,11 @@ class OSSResourceInfo(BaseModel):
         description="The version id of the file. If hit cache, the version id belong cache file, otherwise, source file.",
     )
     suffix: Optional[str] = Field(default=None, description="The suffix of the file.")
+    cache_key: str | None = Field(
+        default=None,
+        exclude=True,
+        description="The key of the cache file in the cache bucket, derived from cache_file_path.",
+    )
 
     @model_validator(mode="after")
     def check(self):
@@ -38,10 +50,12 @@ class OSSResourceInfo(BaseModel):
         if self.suffix is None and self.url is not None:
             self.suffix = Path(self.url.path).suffix
 
-        if not self.source_file_path.startswith(setting.oss.bucket):
-            self.source_file_path = f"{setting.oss.bucket}/{self.source_file_path}"
-        if self.cache_file_path is not None and not self.cache_file_path.startswith(setting.oss.cache_bucket):
-            self.cache_file_path = f"{setting.oss.cache_bucket}/{self.cache_file_path}"
+        if not self.source_file_path.startswith(_BUCKET_PREFIX):
+            self.source_file_path = _BUCKET_PREFIX + self.source_file_path
+        if self.cache_file_path is not None and not self.cache_file_path.startswith(_CACHE_BUCKET_PREFIX):
+            self.cache_file_path = _CACHE_BUCKET_PREFIX + self.cache_file_path
+        if self.cache_file_path is not None:
+            self.cache_key = self.cache_file_path[len(_CACHE_BUCKET_PREFIX) :]
 
         return self
 
@@ -52,6 +66,13 @@ class OSSStore:
     _oss_available: bool
     _oss_cache_available: bool
 
+    # the OSS lookups of `check_file_path`, shared by all stores. the uploads of this process drop the entries of their
+    # file, the ttl bounds how long a change made elsewhere, e.g. a re-uploaded source file, goes unseen
+    check_cache_ttl: float = 30.0
+    check_cache_size: int = 1024
+    _check_cache: "OrderedDict[Tuple, Tuple[float, OSSResourceInfo]]" = OrderedDict()
+    _check_cache_lock = threading.Lock()
+
     def __init__(
         self,
         params: OSSStoreInitParams,
@@ -191,75 +212,142 @@ class OSSStore:
         Returns:
             PathLike | OSSResourceInfo: The local file path or OSS resource info.
         """
-        # find file path from local first
-        if Path(file_path).exists():
-            return Path(file_path)
+        # find file path from local first. one stat, a directory is not taken for a local file
+        local_path = Path(file_path)
+        if local_path.is_file():
+            return local_path
 
         if self.oss_available:
-            # check oss file exist
-            from botocore.exceptions import ClientError
+            use_cache = self.oss_cache_available and self.use_cache
+            key = (
+                self.oss_bucket,
+                str(file_path),
+                kwargs.get("version_id", ""),
+                kwargs.get("cache_version_id", "") if use_cache else None,
+            )
+            now = time.monotonic()
+            with self._check_cache_lock:
+                cached = self._check_cache.get(key)
+                if cached is not None and cached[0] > now:
+                    self._check_cache.move_to_end(key)
+                    return cached[1]
+
+            resource_info = self._check_oss_file_path(file_path, use_cache, **kwargs)
+
+            # a missed cache file is about to be written by the parser, so the next lookup must see it
+            if resource_info.hit_cache or not (use_cache and self.update_cache):
+                with self._check_cache_lock:
+                    self._check_cache[key] = (now + self.check_cache_ttl, resource_info)
+                    self._check_cache.move_to_end(key)
+                    while len(self._check_cache) > self.check_cache_size:
+                        self._check_cache.popitem(last=False)
+            return resource_info
+        else:
+            raise FileNotFoundError(f"File not found: {file_path} in local.")
+
+    def _invalidate_check_cache(self, file_path: PathLike | str | None = None, cache_key: str | None = None):
+        """
+        Drop the cached lookups of the file, or of the files parsed to the cache file. Called after a write that changes
+        the answer of `check_file_path`, e.g. an upload or a deletion of the file or of its parsed cache file.
+
+        Args:
+            file_path (PathLike, optional): The file path as passed to `check_file_path`.
+            cache_key (str, optional): The key of the parsed cache file in the cache bucket.
+        """
+        with self._check_cache_lock:
+            for key in [
+                key
+                for key, (_, resource_info) in self._check_cache.items()
+                if (file_path is not None and key[1] == str(file_path))
+                or (cache_key is not None and resource_info.cache_key == cache_key)
+            ]:
+                del self._check_cache[key]
+
+    def _put_parsed_cache(self, resource_info: OSSResourceInfo, content: str):
+        """
+        Upload the parsed content of the OSS file to the cache bucket, so the next parse of the file hits the cache.
+
+        Args:
+            resource_info (OSSResourceInfo): The resource info of the parsed file.
+            content (str): The parsed content.
+        """
+        self.oss_client.put_object(Bucket=self.oss_cache_bucket, Key=resource_info.cache_key, Body=content)
+        self._invalidate_check_cache(cache_key=resource_info.cache_key)
+
+    def _check_oss_file_path(self, file_path: PathLike | str, use_cache: bool, **kwargs) -> OSSResourceInfo:
+        """
+        Look up the file in the OSS bucket and its parsed file in the cache bucket, and presign the url to download.
 
+        Args:
+            file_path (PathLike): The file path to check.
+            use_cache (bool): Whether to look up the parsed file in the cache bucket.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            OSSResourceInfo: The OSS resource info.
+        """
+        # check oss file exist
+        from botocore.exceptions import ClientError
+
+        try:
+            oss_file_info = self.oss_client.head_object(
+                Bucket=setting.oss.bucket,
+                Key=str(file_path),
+                VersionId=kwargs.get("version_id", ""),
+            )
+        except ClientError:
+            raise FileNotFoundError(f"File not found: {file_path} in local and bucket: {setting.oss.bucket}")
+
+        md5_value = oss_file_info["ETag"].replace('"', "")
+        cache_file_path = f"parsed_{md5_value}.md"
+        if use_cache:
+            # check oss cache file exist
             try:
-                oss_file_info = self.oss_client.head_object(
-                    Bucket=setting.oss.bucket,
-                    Key=str(file_path),
-                    VersionId=kwargs.get("version_id", ""),
+                cache_file_info = self.oss_client.head_object(
+                    Bucket=setting.oss.cache_bucket,
+                    Key=cache_file_path,
+                    VersionId=kwargs.get("cache_version_id", ""),
                 )
+                target_bucket = self.oss_cache_bucket
+                target_file_path = cache_file_path
+                target_version_id = cache_file_info.get("VersionId")
+
+                hit_cache = True
             except ClientError:
-                raise FileNotFoundError(f"File not found: {file_path} in local and bucket: {setting.oss.bucket}")
-
-            md5_value = oss_file_info["ETag"].replace('"', "")
-            cache_file_path = f"parsed_{md5_value}.md"
-            if self.oss_cache_available and self.use_cache:
-                # check oss cache file exist
-                try:
-                    cache_file_info = self.oss_client.head_object(
-                        Bucket=setting.oss.cache_bucket,
-                        Key=cache_file_path,
-                        VersionId=kwargs.get("cache_version_id", ""),
-                    )
-                    target_bucket = self.oss_cache_bucket
-                    target_file_path = cache_file_path
-                    target_version_id = cache_file_info.get("VersionId")
-
-                    hit_cache = True
-                except ClientError:
-                    target_bucket = self.oss_bucket
-                    target_file_path = str(file_path)
-                    target_version_id = oss_file_info.get("VersionId")
-
-                    hit_cache = False
-            else:
                 target_bucket = self.oss_bucket
                 target_file_path = str(file_path)
                 target_version_id = oss_file_info.get("VersionId")
 
                 hit_cache = False
-
-            # get temp url for file
-            tmp_oss_url = self.oss_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": target_bucket,
-                    "Key": target_file_path,
-                    "VersionId": target_version_id,
-                }
-                if target_version_id
-                else {
-                    "Bucket": target_bucket,
-                    "Key": target_file_path,
-                },
-            )
-            return OSSResourceInfo(
-                url=tmp_oss_url,
-                source_file_path=str(file_path),
-                cache_file_path=target_file_path if hit_cache else cache_file_path,
-                hit_cache=hit_cache,
-                version_id=target_version_id,
-                suffix=None,
-            )
         else:
-            raise FileNotFoundError(f"File not found: {file_path} in local.")
+            target_bucket = self.oss_bucket
+            target_file_path = str(file_path)
+            target_version_id = oss_file_info.get("VersionId")
+
+            hit_cache = False
+
+        # get temp url for file
+        tmp_oss_url = self.oss_client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": target_bucket,
+                "Key": target_file_path,
+                "VersionId": target_version_id,
+            }
+            if target_version_id
+            else {
+                "Bucket": target_bucket,
+                "Key": target_file_path,
+            },
+        )
+        return OSSResourceInfo(
+            url=tmp_oss_url,
+            source_file_path=str(file_path),
+            cache_file_path=target_file_path if hit_cache else cache_file_path,
+            hit_cache=hit_cache,
+            version_id=target_version_id,
+            suffix=None,
+        )
 
     def store_image(self, params: StoreImageParams) -> Document:
         img_file_name, content_type, binary_data = utils.convert_img_base64_to_file_info(params.image, params.img_desc)
@@ -277,6 +365,7 @@ class OSSStore:
                     "description": quote(params.img_desc),
                 },
             )
+            self._invalidate_check_cache(Path(img_file_path))
             oss_info = OSSResourceInfo(
                 source_file_path=f"{self.oss_bucket}/{img_file_path}",
                 hit_cache=False,
@@ -1,17 +1,26 @@
 import asyncio
-import os
+import io
+import logging
+import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from abc import abstractmethod
 from os import PathLike
 from pathlib import Path
-from typing import Iterable, List, Union, Dict, Literal
+from typing import BinaryIO, Iterable, List, Union, Dict, Literal
 
 import aiohttp
 import requests  # type: ignore[import-untyped]
+from requests.adapters import HTTPAdapter  # type: ignore[import-untyped]
 from langchain_core.documents import Document
 
 from aa_rag.oss import OSSStore, OSSStoreInitParams, OSSResourceInfo
 
+# the parsers are built per call, so the session is shared by all of them to reuse the connections to the OSS endpoint
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=64))
+_HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=64))
+
 
 class BaseParser(OSSStore):
     def __init__(self, use_cache: bool = True, update_cache: bool = True):
@@ -37,18 +46,20 @@ class BaseParser(OSSStore):
 
     def parse(
         self,
-        file_path: PathLike | Iterable[PathLike] | None = None,
+        file_path: str | PathLike | Iterable[str | PathLike] | None = None,
         content: str | Iterable[str]|None = None,
         file_path_extra_kwargs: Dict|None = None,
+        max_concurrency: int = 16,
         **kwargs,
     ) -> List[Document]:
         """
         Parse the provided file path(s) or content into a list of documents.
 
         Args:
-            file_path (PathLike | Iterable[PathLike], optional): The file path(s) to parse. Defaults to None.
+            file_path (str | PathLike | Iterable[str | PathLike], optional): The file path(s) to parse. Defaults to None.
             content (str | Iterable[str], optional): The content to parse. Defaults to None.
             file_path_extra_kwargs (Dict, optional): Additional keyword arguments for each file path. Defaults to None.
+            max_concurrency (int, optional): The maximum number of files processed concurrently. Defaults to 16.
             **kwargs: Additional keyword arguments.
 
         Returns:
@@ -62,46 +73,17 @@ class BaseParser(OSSStore):
 
         if file_path:
             # file_path handling
-            if isinstance(file_path, PathLike):
+            if isinstance(file_path, (str, PathLike)):
                 file_path = [file_path]
-            for _ in file_path:
-                curr_uri: PathLike | OSSResourceInfo = self.check_file_path(_, **file_path_extra_kwargs.get(_, {}))
-                if isinstance(curr_uri, OSSResourceInfo):
-                    with tempfile.NamedTemporaryFile(delete=True, mode="wb", suffix=curr_uri.suffix) as temp_file:
-                        response = requests.get(str(curr_uri.url), stream=True)
-                        response.raise_for_status()
-
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                temp_file.write(chunk)
-
-                        temp_file.flush()
-                        os.fsync(temp_file.fileno())
-
-                        temp_file.seek(0)
-
-                        result.append(
-                            self._parse_file(
-                                Path(temp_file.name),
-                                source="oss",
-                                oss_resource_info=curr_uri,
-                                **kwargs,
-                            )
-                        )
-
-                    # update cache handling
-                    if self.update_cache:
-                        if not curr_uri.hit_cache:
-                            self.oss_client.put_object(
-                                Bucket=self.oss_cache_bucket,
-                                Key=str(Path(curr_uri.cache_file_path).relative_to(self.oss_cache_bucket))
-                                if curr_uri.cache_file_path.startswith(self.oss_cache_bucket)
-                                else curr_uri.cache_file_path,
-                                Body=result[-1].page_content,
-                            )
-
-                elif isinstance(curr_uri, Path):
-                    result.append(self._parse_file(curr_uri, source="local", **kwargs))
+            file_path = list(file_path)
+            if len(file_path) > 1:
+                # the files are independent, their downloads and parsing overlap in the worker threads
+                with ThreadPoolExecutor(max_workers=min(max_concurrency, len(file_path))) as executor:
+                    result += executor.map(
+                        lambda path: self._parse_one(path, file_path_extra_kwargs.get(path, {}), **kwargs), file_path
+                    )
+            else:
+                result += [self._parse_one(path, file_path_extra_kwargs.get(path, {}), **kwargs) for path in file_path]
 
         if content:
             # content handling
@@ -112,20 +94,61 @@ class BaseParser(OSSStore):
 
         return result
 
+    def _parse_one(self, file_path: str | PathLike, file_path_extra_kwargs: Dict, **kwargs) -> Document:
+        """
+        Parse a single local or OSS file, and update the OSS cache with the parsed content.
+
+        Args:
+            file_path (str | PathLike): The file path to parse.
+            file_path_extra_kwargs (Dict): Additional keyword arguments for the file path.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            Document: The parsed document.
+        """
+        curr_uri: PathLike | OSSResourceInfo = self.check_file_path(file_path, **file_path_extra_kwargs)
+        if isinstance(curr_uri, OSSResourceInfo):
+            # keep the download in memory instead of copying it through a temp file
+            buffer = io.BytesIO()
+            with _HTTP_SESSION.get(str(curr_uri.url), stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    buffer.write(chunk)
+            buffer.seek(0)
+
+            document = self._parse_bytes(
+                buffer,
+                suffix=curr_uri.suffix,
+                source="oss",
+                oss_resource_info=curr_uri,
+                **kwargs,
+            )
+
+            # update cache handling
+            if self.update_cache:
+                if not curr_uri.hit_cache:
+                    self._put_parsed_cache(curr_uri, document.page_content)
+            return document
+
+        return self._parse_file(curr_uri, source="local", **kwargs)
+
     async def aparse(
         self,
-        file_path: Union[PathLike, Iterable[PathLike]]|None = None,
+        file_path: Union[str, PathLike, Iterable[Union[str, PathLike]]]|None = None,
         content: Union[str, Iterable[str]]|None = None,
         file_path_extra_kwargs: Dict|None = None,
+        max_concurrency: int = 16,
         **kwargs,
     ) -> List[Document]:
         """
         Asynchronously parse the provided file path(s) or content into a list of documents.
 
         Args:
-            file_path (Union[PathLike, Iterable[PathLike]], optional): The file path(s) to parse. Defaults to None.
+            file_path (Union[str, PathLike, Iterable[Union[str, PathLike]]], optional): The file path(s) to parse.
+                Defaults to None.
             content (Union[str, Iterable[str]], optional): The content to parse. Defaults to None.
             file_path_extra_kwargs (Dict, optional): Additional keyword arguments for each file path. Defaults to None.
+            max_concurrency (int, optional): The maximum number of files processed concurrently. Defaults to 16.
             **kwargs: Additional keyword arguments.
 
         Returns:
@@ -137,43 +160,58 @@ class BaseParser(OSSStore):
         result: List[Document] = []
 
         if file_path:
-            if isinstance(file_path, PathLike):
+            if isinstance(file_path, (str, PathLike)):
                 file_path = [file_path]
 
-            async def process_path(path):
-                curr_uri = self.check_file_path(path, **file_path_extra_kwargs.get(path, {}))
-                if isinstance(curr_uri, OSSResourceInfo):
-                    async with aiohttp.ClientSession() as session:
+            # the blocking OSS requests and parsing run in worker threads, so the files are processed concurrently
+            semaphore = asyncio.Semaphore(max_concurrency)
+            cache_task_s: List[asyncio.Task] = []
+
+            async def process_path(session: aiohttp.ClientSession, path):
+                async with semaphore:
+                    curr_uri = await asyncio.to_thread(
+                        self.check_file_path, path, **file_path_extra_kwargs.get(path, {})
+                    )
+                    if isinstance(curr_uri, OSSResourceInfo):
+                        buffer = io.BytesIO()
                         async with session.get(str(curr_uri.url)) as response:
-                            url_content = await response.read()
-                            with tempfile.NamedTemporaryFile(
-                                delete=True, mode="wb", suffix=curr_uri.suffix
-                            ) as temp_file:
-                                temp_file.write(url_content)
-                                temp_file.flush()
-
-                                # update cache handling
-                                if self.update_cache:
-                                    if not curr_uri.hit_cache:
-                                        self.oss_client.put_object(
-                                            Bucket=self.oss_cache_bucket,
-                                            Key=str(Path(curr_uri.cache_file_path).relative_to(self.oss_cache_bucket))
-                                            if curr_uri.cache_file_path.startswith(self.oss_cache_bucket)
-                                            else curr_uri.cache_file_path,
-                                            Body=url_content.decode("utf8"),
-                                        )
-
-                                return self._parse_file(
-                                    Path(temp_file.name),
-                                    source="oss",
-                                    oss_resource_info=curr_uri,
-                                    **kwargs,
-                                )
-
-                elif isinstance(curr_uri, Path):
-                    return self._parse_file(curr_uri, source="local", **kwargs)
+                            response.raise_for_status()
+                            async for chunk in response.content.iter_chunked(1 << 20):
+                                buffer.write(chunk)
+                        buffer.seek(0)
+
+                        document = await asyncio.to_thread(
+                            self._parse_bytes,
+                            buffer,
+                            suffix=curr_uri.suffix,
+                            source="oss",
+                            oss_resource_info=curr_uri,
+                            **kwargs,
+                        )
 
-            result += await asyncio.gather(*[process_path(p) for p in file_path])
+                        # update cache handling, off the critical path of the remaining files
+                        if self.update_cache:
+                            if not curr_uri.hit_cache:
+                                cache_task_s.append(
+                                    asyncio.create_task(
+                                        asyncio.to_thread(self._put_parsed_cache, curr_uri, document.page_content)
+                                    )
+                                )
+                        return document
+
+                    elif isinstance(curr_uri, Path):
+                        return await asyncio.to_thread(self._parse_file, curr_uri, source="local", **kwargs)
+
+            # one session, so the connections to the OSS endpoint are reused between the files
+            connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=30)
+            try:
+                async with aiohttp.ClientSession(connector=connector) as session:
+                    result += await asyncio.gather(*[process_path(session, p) for p in file_path])
+            finally:
+                # the started uploads are awaited also when a file failed. a failed upload only loses the cached copy
+                for cache_result in await asyncio.gather(*cache_task_s, return_exceptions=True):
+                    if isinstance(cache_result, Exception):
+                        logging.warning(f"Failed to cache the parsed content: {cache_result}")
 
         if content:
             if isinstance(content, str):
@@ -204,6 +242,38 @@ class BaseParser(OSSStore):
         """
         return NotImplemented
 
+    def _parse_bytes(
+        self,
+        data: BinaryIO,
+        suffix: str,
+        source: Literal["local", "oss"],
+        oss_resource_info: OSSResourceInfo = None,
+        **kwargs,
+    ) -> Document:
+        """
+        Parse the file content held in memory. Subclasses able to parse a stream should override it, the default
+        implementation spills the content to a temporary file and calls `_parse_file`.
+
+        Args:
+            data (BinaryIO): The file content.
+            suffix (str): The suffix of the file, e.g. ".pdf".
+            source (Literal["local", "oss"]): The source of the file.
+            oss_resource_info (OSSResourceInfo): The OSS resource info.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            Document: The parsed document.
+        """
+        with tempfile.NamedTemporaryFile(delete=True, mode="wb", suffix=suffix) as temp_file:
+            shutil.copyfileobj(data, temp_file, length=1 << 20)
+            temp_file.flush()
+            return self._parse_file(
+                Path(temp_file.name),
+                source=source,
+                oss_resource_info=oss_resource_info,
+                **kwargs,
+            )
+
     @abstractmethod
     def _parse_content(self, content: str, source: Literal["local", "oss"], **kwargs) -> Document:
         """
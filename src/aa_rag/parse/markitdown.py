@@ -1,9 +1,9 @@
+from functools import lru_cache
 from os import PathLike
 from pathlib import Path
-from typing import Literal
+from typing import BinaryIO, Literal
 
 from langchain_core.documents import Document
-from markitdown import MarkItDown
 from openai import OpenAI
 
 from aa_rag import setting
@@ -12,6 +12,20 @@ from aa_rag.oss import OSSResourceInfo
 from aa_rag.parse.base import BaseParser
 
 
+@lru_cache(maxsize=None)
+def _get_markitdown_client(llm: str):
+    """
+    Get the MarkItDown client of the LLM model. The client registers its converters when it is built, so it is shared
+    by the parsers, which are built per request. The conversions keep no state in the client.
+    """
+    from markitdown import MarkItDown
+
+    return MarkItDown(
+        llm_client=OpenAI(base_url=setting.openai.base_url, api_key=setting.openai.api_key),
+        llm_model=llm,
+    )
+
+
 class MarkitDownParser(BaseParser):
     def __init__(
         self,
@@ -29,10 +43,7 @@ class MarkitDownParser(BaseParser):
             llm (str, optional): The LLM model to use. Defaults to setting.llm.multimodal_model.
             **kwargs: Additional keyword arguments.
         """
-        self.mtd_client = MarkItDown(
-            llm_client=OpenAI(base_url=setting.openai.base_url, api_key=setting.openai.api_key),
-            llm_model=llm,
-        )
+        self.mtd_client = _get_markitdown_client(llm)
 
         super().__init__(use_cache=use_cache, update_cache=update_cache)
 
@@ -70,6 +81,46 @@ class MarkitDownParser(BaseParser):
         else:
             content_str = self.mtd_client.convert(str(file_path)).text_content
 
+        return self._to_document(content_str, source, file_path, oss_resource_info)
+
+    def _parse_bytes(
+        self,
+        data: BinaryIO,
+        suffix: str,
+        source: Literal["local", "oss"],
+        oss_resource_info: OSSResourceInfo = None,
+        **kwargs,
+    ) -> Document:
+        """
+        Parse the file content held in memory into a Document, without writing it to disk.
+
+        Args:
+            data (BinaryIO): The file content.
+            suffix (str): The suffix of the file, e.g. ".pdf".
+            source (Literal["local", "oss"]): The source of the file.
+            oss_resource_info (OSSResourceInfo): The OSS resource info. Defaults to None.
+            **kwargs: Additional keyword arguments.
+
+        Returns:
+            Document: The parsed document.
+        """
+        if suffix in [".md"]:
+            content_str = data.read().decode("utf-8")
+        else:
+            content_str = self.mtd_client.convert_stream(data, file_extension=suffix).text_content
+
+        return self._to_document(content_str, source, None, oss_resource_info)
+
+    @staticmethod
+    def _to_document(
+        content_str: str,
+        source: Literal["local", "oss"],
+        file_path: PathLike | None,
+        oss_resource_info: OSSResourceInfo | None,
+    ) -> Document:
+        """
+        Build the Document of the parsed content with the metadata of its source.
+        """
         if source == "oss":
             return Document(
                 page_content=content_str,
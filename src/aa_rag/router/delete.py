@@ -1,7 +1,9 @@
+import json
 from typing import List
 
 from fastapi import APIRouter, status, Response
 
+from aa_rag import utils
 from aa_rag.engine.simple_chunk import SimpleChunk, SimpleChunkInitParams
 from aa_rag.gtypes.models.delete import (
     SimpleChunkDeleteItem,
@@ -27,24 +29,23 @@ def qa(id: str | None = None, ids: List[str] | None = None):
 
     if id:
         with engine.db.using(engine.table_name) as table:
-            table.delete(f'id in ["{id}"]')
+            table.delete(f"id in {json.dumps([id], ensure_ascii=False)}")
     if ids:
-        cond = ",".join([f'"{i}"' for i in ids])
-        cond = f"id in [{cond}]"
+        # the ids are encoded as JSON string literals, so a quote in an id can not change the expression
+        cond = f"id in {json.dumps(ids, ensure_ascii=False)}"
         with engine.db.using(engine.table_name) as table:
             table.delete(cond)
 
 
 @router.post("/knowledge", status_code=status.HTTP_204_NO_CONTENT)
 def knowledge(request: SimpleChunkDeleteItem):
-    engine = SimpleChunk(params=SimpleChunkInitParams(**request.model_dump()))
+    engine = SimpleChunk(params=utils.construct_from(SimpleChunkInitParams, request))
 
     if request.id:
         with engine.db.using(engine.table_name) as table:
-            table.delete(f'id in ["{request.id}"]')
+            table.delete(f"id in {json.dumps([request.id], ensure_ascii=False)}")
     if request.ids:
-        cond = ",".join([f'"{i}"' for i in request.ids])
-        cond = f"id in [{cond}]"
+        cond = f"id in {json.dumps(request.ids, ensure_ascii=False)}"
         with engine.db.using(engine.table_name) as table:
             table.delete(cond)
 
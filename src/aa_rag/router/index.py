@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Response, status
 
 from aa_rag import utils
@@ -32,20 +34,17 @@ router = APIRouter(
     status_code=status.HTTP_201_CREATED,
 )
 async def chunk_index(item: SimpleChunkIndexItem, response: Response) -> IndexResponse:
-    source_data = await utils.parse_content(params=ParserNeedItem(**item.model_dump()))
+    source_data = await utils.parse_content(params=utils.construct_from(ParserNeedItem, item))
 
-    # index content
-    engine = SimpleChunk(params=SimpleChunkInitParams(**item.model_dump()))
+    # index content. the engine connects to the vector db and looks its table up, so it is built off the event loop too
+    engine = await asyncio.to_thread(SimpleChunk, params=utils.construct_from(SimpleChunkInitParams, item))
 
-    engine.index(
-        params=SimpleChunkIndexParams(
-            **{
-                **item.model_dump(),
-                "source_data": source_data,
-            }
-        )
+    await asyncio.to_thread(
+        engine.index,
+        params=utils.construct_from(SimpleChunkIndexParams, item, source_data=source_data),
     )
-    return IndexResponse(
+    # the response is built from trusted server-side data, so the validation is skipped
+    return IndexResponse.model_construct(
         response=response,
         message="Indexing completed via SimpleChunkIndex",
         data=[],
@@ -60,21 +59,15 @@ async def chunk_index(item: SimpleChunkIndexItem, response: Response) -> IndexRe
 )
 async def lightrag_index(item: LightRAGIndexItem, response: Response) -> IndexResponse:
     # parse content
-    source_data = await utils.parse_content(params=ParserNeedItem(**item.model_dump()))
+    source_data = await utils.parse_content(params=utils.construct_from(ParserNeedItem, item))
 
     # index content
-    engine = LightRAGEngine(params=LightRAGInitParams(**item.model_dump()))
+    engine = LightRAGEngine(params=utils.construct_from(LightRAGInitParams, item))
 
-    await engine.index(
-        params=LightRAGIndexParams(
-            **{
-                **item.model_dump(),
-                "source_data": source_data,
-            }
-        )
-    )
+    await engine.index(params=utils.construct_from(LightRAGIndexParams, item, source_data=source_data))
 
-    return IndexResponse(
+    # the response is built from trusted server-side data, so the validation is skipped
+    return IndexResponse.model_construct(
         response=response,
         message="Indexing completed via LightRAGIndex",
         data=[],
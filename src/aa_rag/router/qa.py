@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, status, Response
 
 from aa_rag.gtypes.models.knowlege_base.qa import (
@@ -25,9 +27,11 @@ async def root():
     status_code=status.HTTP_201_CREATED,
 )
 async def index(item: QAIndexItem, response: Response):
-    qa = QAKnowledge()
+    # the blocking work runs in worker threads. the database objects are shared by them, the engine only writes
+    # through the table views returned by `using`, which are bound per call.
+    qa = await asyncio.to_thread(QAKnowledge)
 
-    qa.index(**item.model_dump(include={"error_desc", "error_solution", "tags"}))
+    await asyncio.to_thread(qa.index, **item.model_dump(include={"error_desc", "error_solution", "tags"}))
 
     return QAIndexResponse(
         response=response,
@@ -38,9 +42,9 @@ async def index(item: QAIndexItem, response: Response):
 
 @router.post("/retrieve", response_model=QARetrieveResponse)
 async def retrieve(item: QARetrieveItem, response: Response):
-    qa = QAKnowledge()
+    qa = await asyncio.to_thread(QAKnowledge)
 
-    result = qa.retrieve(**item.model_dump(include={"error_desc", "tags"}))
+    result = await asyncio.to_thread(qa.retrieve, **item.model_dump(include={"error_desc", "tags"}))
     if result:
         return QARetrieveResponse(
             response=response,
@@ -1,4 +1,9 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import ORJSONResponse
+
+from aa_rag import utils
 
 from aa_rag.engine.lightrag import (
     LightRAGEngine,
@@ -25,15 +30,21 @@ router = APIRouter(
 
 @router.post("/chunk", tags=["SimpleChunk"], response_model=RetrieveResponse)
 async def chunk_retrieve(item: SimpleChunkRetrieveItem, response: Response) -> RetrieveResponse:
-    engine = SimpleChunk(SimpleChunkInitParams(**item.model_dump()))
+    # the item is validated by FastAPI, the engine parameters are built from it without validation. the engine connects
+    # to the vector db when it is built, so it is built off the event loop
+    engine = await asyncio.to_thread(SimpleChunk, utils.construct_from(SimpleChunkInitParams, item))
 
-    result = engine.retrieve(SimpleChunkRetrieveParams(**item.model_dump()))
+    result = await engine.aretrieve(utils.construct_from(SimpleChunkRetrieveParams, item))
 
     if result:
-        return RetrieveResponse(
-            response=response,
-            message=f"Retrieval completed via HybridRetrieve in {item.retrieve_mode}",
-            data=result,
+        # the engine already returns the documents as `{"metadata", "page_content"}` dicts, so they are dumped by orjson
+        # as they are, instead of serialized through the response model, which expects `Document` objects
+        return ORJSONResponse(
+            RetrieveResponse.model_construct(
+                response=response,
+                message=f"Retrieval completed via HybridRetrieve in {item.retrieve_mode}",
+                data=result,
+            ).model_dump(mode="json", warnings=False)
         )
     else:
         response.status_code = 404
@@ -45,9 +56,9 @@ async def chunk_retrieve(item: SimpleChunkRetrieveItem, response: Response) -> R
 
 @router.post("/lightrag", tags=["LightRAG"], response_model=RetrieveResponse)
 async def lightrag_retrieve(item: LightRAGRetrieveItem, response: Response) -> RetrieveResponse:
-    engine = LightRAGEngine(LightRAGInitParams(**item.model_dump()))
+    engine = LightRAGEngine(utils.construct_from(LightRAGInitParams, item))
 
-    result = await engine.retrieve(LightRAGRetrieveParams(**item.model_dump()))
+    result = await engine.retrieve(utils.construct_from(LightRAGRetrieveParams, item))
 
     return RetrieveResponse(
         response=response,
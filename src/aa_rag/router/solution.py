@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, status, Response
 
 from aa_rag import utils
@@ -78,18 +80,22 @@ async def index(item: SolutionIndexItem, response: Response):
         SolutionIndexResponse: The response model indicating the result of the indexing
         operation, including a success message and status code.
     """
-    solution = SolutionKnowledge(**item.model_dump(include={"llm", "embedding_model"}))
+    solution = await asyncio.to_thread(SolutionKnowledge, **item.model_dump(include={"llm", "embedding_model"}))
 
-    solution.index(**item.model_dump(include={"env_info", "procedure", "project_meta"}))
+    await asyncio.to_thread(solution.index, **item.model_dump(include={"env_info", "procedure", "project_meta"}))
 
     return SolutionIndexResponse(response=response)
 
 
 @router.post("/retrieve", response_model=SolutionRetrieveResponse)
 async def retrieve(item: SolutionRetrieveItem, response: Response):
-    solution = SolutionKnowledge(**item.model_dump(include={"llm", "embedding_model", "relation_db_path"}))
+    solution = await asyncio.to_thread(
+        SolutionKnowledge, **item.model_dump(include={"llm", "embedding_model", "relation_db_path"})
+    )
 
-    guide: Guide | None = solution.retrieve(**item.model_dump(include={"env_info", "project_meta"}))
+    guide: Guide | None = await asyncio.to_thread(
+        solution.retrieve, **item.model_dump(include={"env_info", "project_meta"})
+    )
     if guide is None:
         response.status_code = 404
         return SolutionRetrieveResponse(
@@ -1,8 +1,10 @@
+import json
 from typing import Dict, List
 
 import pandas as pd
 from fastapi import APIRouter, Response
 
+from aa_rag import utils
 from aa_rag.engine.simple_chunk import SimpleChunkInitParams, SimpleChunk
 from aa_rag.gtypes.models.statistic import SimpleChunkStatisticItem
 from aa_rag.knowledge_base.built_in.qa import QAKnowledge
@@ -20,15 +22,15 @@ router = APIRouter(
 @router.post("/knowledge")
 def knowledge(request: SimpleChunkStatisticItem, response: Response):
     result: List = []
-    engine = SimpleChunk(params=SimpleChunkInitParams(**request.model_dump()))
+    engine = SimpleChunk(params=utils.construct_from(SimpleChunkInitParams, request))
 
-    if engine.table_name not in engine.db.table_list():
+    if not engine.db.has_table(engine.table_name):
         response.status_code = 404
         return []
     else:
         with engine.db.using(engine.table_name) as table:
             hit_record_s = table.query(
-                f'array_contains(identifier,"{request.identifier}")',
+                f"array_contains(identifier, {json.dumps(request.identifier, ensure_ascii=False)})",
                 output_fields=["id", "metadata", "text"],
             )
         if hit_record_s:
@@ -102,9 +104,9 @@ def solution(response: Response, project_name: str | None = None):
 
     with solution_obj.nosql_db.using(solution_obj.table_name) as table:
         if project_name:
-            hit_docs_s = table.select({"name": project_name})
+            hit_docs_s = table.iselect({"name": project_name})
         else:
-            hit_docs_s = table.select()
+            hit_docs_s = table.iselect()
         for record in hit_docs_s:
             record.pop("_id") if "_id" in record.keys() else None
 
@@ -113,7 +115,7 @@ def solution(response: Response, project_name: str | None = None):
                 result[crt_project_name] = {}
             result[crt_project_name] = record
 
-    if hit_docs_s:
+    if result:
         pass
     else:
         response.status_code = 404
@@ -1,10 +1,13 @@
 import ast
 import importlib
+import os
+from enum import Enum
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Any, Literal
+from typing import Optional, Any, Literal, Dict
 
 from dotenv.main import DotEnv
-from pydantic import BaseModel, Field, SecretStr, model_validator
+from pydantic import BaseModel, ConfigDict, Field, SecretStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from aa_rag.gtypes.enums import (
@@ -18,9 +21,23 @@ from aa_rag.gtypes.enums import (
 )
 
 
+# resolved once, so a later change of the working directory does not change the file the settings are read from. the
+# file is looked up at this path only, the parent directories are not searched
+_DOTENV_PATH = Path(os.environ.get("AA_RAG_ENV_FILE", ".env")).absolute()
+
+
+@lru_cache(maxsize=1)
+def _dotenv_values() -> Dict[str, Optional[str]]:
+    """
+    Read the .env file once. Every setting default is loaded from it, so parsing it per key made the import of the
+    package read the file dozens of times.
+    """
+    return DotEnv(_DOTENV_PATH, verbose=False, encoding="utf-8").dict()
+
+
 def load_env(key: str, default: Any = None):
     """
-    Load environment variable from .env file. Convert to python object if possible.
+    Load environment variable from .env file. Convert it to the type of the default value if possible.
 
     Args:
         key (str): Environment variable key.
@@ -30,7 +47,7 @@ def load_env(key: str, default: Any = None):
     Returns:
         Any: Python object representing the environment variable value or the default value.
     """
-    env = DotEnv(Path(".env").absolute(), verbose=False, encoding="utf-8")
+    env = _dotenv_values()
 
     if isinstance(default, tuple):
         env_mode = env.get("ENVIRONMENT")
@@ -51,13 +68,44 @@ def load_env(key: str, default: Any = None):
     if value is None:
         return default
     else:
-        try:
-            return ast.literal_eval(value)
-        except (ValueError, SyntaxError):
-            return value
+        return _parse_env_value(value, default)
+
+
+def _parse_env_value(value: str, default: Any) -> Any:
+    """
+    Convert the environment variable value to the type of its default value. The strings, e.g. the API keys and URLs,
+    are returned as they are instead of being evaluated as a python literal. The values that cannot be converted are
+    returned as strings.
+    """
+    try:
+        match default:
+            case bool():
+                return value.strip().lower() in ("true", "1", "yes", "on")
+            case int() | float():
+                try:
+                    return int(value)
+                except ValueError:
+                    return float(value)
+            case Enum():
+                return type(default)(value)
+            case str() | None:
+                return value
+            case _:
+                return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
 
+class SettingModel(BaseModel):
+    """
+    Base of the setting groups. The settings are read once at import and many defaults are bound from them, so they are
+    frozen instead of silently diverging from the values already in use when changed at runtime.
+    """
 
-class Server(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+
+class Server(SettingModel):
     host: str = Field(default="0.0.0.0", description="The host address for the server.")
     port: int = Field(default=222, description="The port number on which the server listens.")
     environment: Literal["Development", "Production"] = Field(
@@ -66,7 +114,7 @@ class Server(BaseModel):
     )
 
 
-class OpenAI(BaseModel):
+class OpenAI(SettingModel):
     api_key: Optional[SecretStr] = Field(
         default=load_env("OPENAI_API_KEY"),
         alias="OPENAI_API_KEY",
@@ -86,14 +134,22 @@ class OpenAI(BaseModel):
         return self
 
 
-class Storage(BaseModel):
-    class LanceDB(BaseModel):
+class Storage(SettingModel):
+    class LanceDB(SettingModel):
         uri: str = Field(
             default="./storage/lancedb",
             description="URI for lanceDB database location.",
         )
+        index_min_rows: int = Field(
+            default=load_env("STORAGE_LANCEDB_INDEX_MIN_ROWS", 5000),
+            description="Minimum number of rows before an ANN index is built on the vector column.",
+        )
+        index_type: Literal["IVF_PQ", "IVF_HNSW_SQ", "IVF_HNSW_PQ", "IVF_FLAT"] = Field(
+            default=load_env("STORAGE_LANCEDB_INDEX_TYPE", "IVF_HNSW_SQ"),
+            description="Type of the ANN index on the vector column. IVF_HNSW_SQ quantizes the vectors to int8.",
+        )
 
-    class Milvus(BaseModel):
+    class Milvus(SettingModel):
         uri: str = Field(
             default=load_env(
                 "STORAGE_MILVUS_URI",
@@ -108,14 +164,24 @@ class Storage(BaseModel):
             validate_default=True,
         )
         db_name: str = Field(default="aarag", description="Database name for the Milvus server.")
+        index_type: Literal["AUTOINDEX", "FLAT", "IVF_FLAT", "IVF_SQ8", "HNSW"] = Field(
+            default=load_env("STORAGE_MILVUS_INDEX_TYPE", "AUTOINDEX"),
+            description="Type of the index on the vector field. IVF_SQ8 quantizes the vectors to int8.",
+        )
 
-    class TinyDB(BaseModel):
+    class TinyDB(SettingModel):
         uri: str = Field(
             default="./storage/tinydb.json",
             description="URI for the relational database location.",
         )
 
-    class MongoDB(BaseModel):
+    class SQLite(SettingModel):
+        uri: str = Field(
+            default="./storage/sqlite.db",
+            description="URI for the SQLite database file location.",
+        )
+
+    class MongoDB(SettingModel):
         uri: str = Field(
             default="mongodb://localhost:27017",
             description="URI for the MongoDB server location.",
@@ -128,7 +194,7 @@ class Storage(BaseModel):
         )
         db_name: str = Field(default="aarag", description="Database name for the MongoDB server.")
 
-    class Neo4j(BaseModel):
+    class Neo4j(SettingModel):
         uri: str = Field(
             default=load_env("STORAGE_NEO4J_URI", (None, "bolt://localhost:7687")),
             description="URI for the Neo4j server location.",
@@ -157,6 +223,10 @@ class Storage(BaseModel):
         default_factory=TinyDB,
         description="TinyDB database configuration settings.",
     )
+    sqlite: SQLite = Field(
+        default_factory=SQLite,
+        description="SQLite database configuration settings.",
+    )
     mongodb: MongoDB = Field(
         default_factory=MongoDB,
         description="MongoDB database configuration settings.",
@@ -187,14 +257,38 @@ class Storage(BaseModel):
         return self
 
 
-class Embedding(BaseModel):
+class Embedding(SettingModel):
     model: str = Field(
         default="text-embedding-3-small",
         description="Model used for generating text embeddings.",
     )
+    query_cache_size: int = Field(
+        default=load_env("EMBEDDING_QUERY_CACHE_SIZE", 2048),
+        description="Number of query embeddings cached in memory. Set to 0 to disable the cache.",
+    )
+    document_cache_size: int = Field(
+        default=load_env("EMBEDDING_DOCUMENT_CACHE_SIZE", 4096),
+        description="Number of document embeddings cached in memory. Set to 0 to disable the cache.",
+    )
+    batch_size: int = Field(
+        default=load_env("EMBEDDING_BATCH_SIZE", 512),
+        description="Number of texts sent in one embedding request.",
+    )
+    max_concurrency: int = Field(
+        default=load_env("EMBEDDING_MAX_CONCURRENCY", 8),
+        description="Maximum number of embedding requests sent concurrently.",
+    )
+    query_batch_size: int = Field(
+        default=load_env("EMBEDDING_QUERY_BATCH_SIZE", 32),
+        description="Maximum number of concurrent query embeddings merged into one request.",
+    )
+    query_batch_wait_ms: float = Field(
+        default=load_env("EMBEDDING_QUERY_BATCH_WAIT_MS", 5),
+        description="Time window in milliseconds to merge concurrent query embeddings. Set to 0 to disable merging.",
+    )
 
 
-class LLM(BaseModel):
+class LLM(SettingModel):
     model: str = Field(
         default="gpt-4o",
         description="Model used for understanding text.",
@@ -205,9 +299,9 @@ class LLM(BaseModel):
     )
 
 
-class Engine(BaseModel):
-    class SimpleChunk(BaseModel):
-        class Index(BaseModel):
+class Engine(SettingModel):
+    class SimpleChunk(SettingModel):
+        class Index(SettingModel):
             chunk_size: int = Field(
                 default=load_env("ENGINE_SIMPLECHUNK_INDEX_CHUNK_SIZE", 1000),
                 description="Size of each chunk in the index.",
@@ -216,9 +310,13 @@ class Engine(BaseModel):
                 default=load_env("ENGINE_SIMPLECHUNK_INDEX_OVERLAP_SIZE", 100),
                 description="Overlap size between chunks in the index.",
             )
+            write_batch_size: int = Field(
+                default=load_env("ENGINE_SIMPLECHUNK_INDEX_WRITE_BATCH_SIZE", 1024),
+                description="Number of chunks embedded and written to the database in one batch.",
+            )
 
-        class Retrieve(BaseModel):
-            class Weight(BaseModel):
+        class Retrieve(SettingModel):
+            class Weight(SettingModel):
                 dense: float = Field(
                     default=0.5,
                     description="Weight for dense retrieval methods.",
@@ -237,6 +335,28 @@ class Engine(BaseModel):
                 default=RetrieveType.HYBRID,
                 description="Type of retrieval strategy used.",
             )
+            cache_size: int = Field(
+                default=load_env("ENGINE_SIMPLECHUNK_RETRIEVE_CACHE_SIZE", 1024),
+                description="Number of retrieve results cached in memory. Set to 0 to disable the cache.",
+            )
+            cache_ttl: float = Field(
+                default=load_env("ENGINE_SIMPLECHUNK_RETRIEVE_CACHE_TTL", 300),
+                description="Time in seconds a cached retrieve result is served.",
+            )
+            cache_similarity: float = Field(
+                default=load_env("ENGINE_SIMPLECHUNK_RETRIEVE_CACHE_SIMILARITY", 1.0),
+                description="Minimum cosine similarity of the query embeddings for a query to hit a cached result. "
+                "1 only serves the results of the same query.",
+            )
+            bm25_cache_ttl: float = Field(
+                default=load_env("ENGINE_SIMPLECHUNK_RETRIEVE_BM25_CACHE_TTL", 60),
+                description="Time in seconds a cached BM25 index of a table is used before it is rebuilt.",
+            )
+            bm25_cache_size: int = Field(
+                default=load_env("ENGINE_SIMPLECHUNK_RETRIEVE_BM25_CACHE_SIZE", 64),
+                description="Number of BM25 indexes cached in memory, one per table and identifier. Set to 0 to "
+                "disable the cache.",
+            )
 
         index: Index = Field(default_factory=Index, description="Index configuration settings.")
         retrieve: Retrieve = Field(
@@ -244,7 +364,7 @@ class Engine(BaseModel):
             description="Retrieve configuration settings.",
         )
 
-    class LightRAG(BaseModel):
+    class LightRAG(SettingModel):
         dir: str = Field(
             default="./storage/lightrag",
             description="Directory for LightRAG database location.",
@@ -306,8 +426,8 @@ class Engine(BaseModel):
     )
 
 
-class Retrieve(BaseModel):
-    class Weight(BaseModel):
+class Retrieve(SettingModel):
+    class Weight(SettingModel):
         dense: float = Field(default=0.5, description="Weight for dense retrieval methods.")
         sparse: float = Field(default=0.5, description="Weight for sparse retrieval methods.")
 
@@ -322,7 +442,7 @@ class Retrieve(BaseModel):
     )
 
 
-class OSS(BaseModel):
+class OSS(SettingModel):
     access_key: Optional[str] = Field(
         default=load_env("OSS_ACCESS_KEY"),
         alias="OSS_ACCESS_KEY",
@@ -378,7 +498,8 @@ class Settings(BaseSettings):
 
     # 这里禁用了自动的 CLI 解析
     model_config = SettingsConfigDict(
-        env_file=".env",
+        frozen=True,
+        env_file=_DOTENV_PATH,
         env_nested_delimiter="_",
         extra="ignore",
     )
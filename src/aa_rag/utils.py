@@ -1,76 +1,377 @@
+import asyncio
 import base64
+from array import array
+from collections import OrderedDict
 import hashlib
 import mimetypes
+import queue
 import re
+import threading
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from io import StringIO
-from typing import List, Tuple
+from typing import Callable, Dict, List, Tuple, Type, TypeVar
 
+import httpx
+import openai
 import pandas as pd
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseChatModel
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from pydantic import BaseModel
 
 from aa_rag import setting
-from aa_rag.db import LanceDBDataBase
 from aa_rag.db.base import BaseVectorDataBase, BaseNoSQLDataBase
-from aa_rag.db.milvus_ import MilvusDataBase
 from aa_rag.db.mongo_ import MongoDBDataBase
+from aa_rag.db.sqlite_ import SQLiteDataBase
 from aa_rag.db.tinydb_ import TinyDBDataBase
 from aa_rag.gtypes.enums import VectorDBType, NoSQLDBType, ParsingType
 from aa_rag.gtypes.models.knowlege_base.solution import Guide
 from aa_rag.gtypes.models.parse import ParserNeedItem
-from aa_rag.parse.markitdown import MarkitDownParser
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
 
-def calculate_md5(input_string: str) -> str:
+
+def calculate_md5(data: str | bytes) -> str:
     """
-    Calculate the MD5 hash of a string.
+    Calculate the MD5 hash of a string or bytes. The hash is a content fingerprint used as the persisted id of the chunks and
+    documents, not a cryptographic digest, so changing the algorithm would change the ids of the indexed data.
 
     Args:
-        input_string (str): need to be calculated.
+        data (str | bytes): need to be calculated. A string is hashed as its UTF-8 bytes, bytes are hashed as they
+            are, without a copy.
 
     Returns:
-        str: MD5 hash of the input string.
+        str: MD5 hash of the input.
     """
-    md5_hash = hashlib.md5()
-    md5_hash.update(input_string.encode("utf-8"))
-    return md5_hash.hexdigest()
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.md5(data, usedforsecurity=False).hexdigest()
 
 
-def get_embedding_model(model_name: str, return_dim: bool = False) -> Embeddings | tuple[Embeddings, int]:
+class QueryBatcher:
+    """
+    Merge the texts submitted from concurrent threads within a short time window into one embedding request.
     """
-    Get the embedding model based on the model name.
-    Args:
-        model_name (str): Model name.
-        return_dim (bool): Return the embedding dimension if True.
 
-    Returns:
-        Embeddings: Embedding model instance.
-        If return_dim is True, also returns the number of dimensions.
+    def __init__(
+        self,
+        embed_func: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = setting.embedding.query_batch_size,
+        max_wait_ms: float = setting.embedding.query_batch_wait_ms,
+        max_concurrency: int = setting.embedding.max_concurrency,
+    ):
+        self.embed_func = embed_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue[Tuple[str, Future]] = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._in_flight = 0  # number of batches sent and not answered yet
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Embed the text together with the texts submitted by other threads in the same time window.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            List[float]: The embedding of the text.
+        """
+        return self._submit(text).result()
+
+    async def aembed(self, text: str) -> List[float]:
+        """
+        Embed the text like `embed`, awaiting the batch instead of blocking a thread, so the queries of the event loop
+        are merged with the queries of the worker threads.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            List[float]: The embedding of the text.
+        """
+        return await asyncio.wrap_future(self._submit(text))
+
+    def _submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        self._ensure_worker()
+        return future
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # a lone query with no batch in flight is sent at once, there is nothing to merge it with. the window is
+            # only waited for under concurrent load.
+            with self._lock:
+                idle = self._in_flight == 0
+            deadline = time.monotonic() + (0 if idle and self._queue.empty() else self.max_wait)
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            # send the batch in the pool, so the next batch can be collected while this one is in flight
+            with self._lock:
+                self._in_flight += 1
+            self._executor.submit(self._embed_batch, batch)
+
+    def _embed_batch(self, batch: List[Tuple[str, Future]]):
+        try:
+            vector_s = self.embed_func([text for text, _ in batch])
+            if len(vector_s) != len(batch):
+                # a future left without result would block its caller forever
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(vector_s)}")
+        except Exception as e:
+            error, vector_s = e, []
+        else:
+            error = None
+        finally:
+            # counted down before the callers are woken up, so their next query finds the batcher idle
+            with self._lock:
+                self._in_flight -= 1
+
+        if error is not None:
+            for _, future in batch:
+                future.set_exception(error)
+        else:
+            for (_, future), vector in zip(batch, vector_s):
+                future.set_result(vector)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings adapter that caches the query embeddings in a LRU cache, and merges the concurrent query embeddings, sync
+    and async, into one request. Document embeddings are cached by the hash of the text, the missed ones are split into batches which
+    are requested concurrently.
+    """
 
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        maxsize: int = setting.embedding.query_cache_size,
+        batch_size: int = setting.embedding.batch_size,
+        max_concurrency: int = setting.embedding.max_concurrency,
+        query_batch_wait_ms: float = setting.embedding.query_batch_wait_ms,
+        document_cache_size: int = setting.embedding.document_cache_size,
+    ):
+        self.embeddings = embeddings
+        self.query_cache_size = maxsize
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.document_cache_size = document_cache_size
+        # text hash -> vector, kept in LRU order. the vectors are kept as doubles, so a hit returns the floats of a miss
+        self._document_cache: OrderedDict[bytes, array] = OrderedDict()
+        self._document_cache_lock = threading.Lock()
+        # query text -> vector, kept in LRU order
+        self._query_cache: OrderedDict[str, Tuple[float, ...]] = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        # OpenAI embeds a query the same way as a document, so the queries can be merged into one document request.
+        self._query_batcher = (
+            QueryBatcher(embeddings.embed_documents, max_wait_ms=query_batch_wait_ms, max_concurrency=max_concurrency)
+            if query_batch_wait_ms > 0
+            else None
+        )
+
+    def _get_cached_query(self, text: str) -> Tuple[float, ...] | None:
+        with self._query_cache_lock:
+            vector = self._query_cache.get(text)
+            if vector is not None:
+                self._query_cache.move_to_end(text)
+            return vector
+
+    def _put_cached_query(self, text: str, vector: List[float]):
+        if self.query_cache_size <= 0:
+            return
+        with self._query_cache_lock:
+            self._query_cache[text] = tuple(vector)
+            self._query_cache.move_to_end(text)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    @staticmethod
+    def _text_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _get_cached_documents(self, texts: List[str]) -> Tuple[Dict[bytes, List[float]], List[str]]:
+        """
+        Look up the texts in the document cache.
+
+        Returns:
+            Tuple[Dict[bytes, List[float]], List[str]]: The cached vectors by text key, and the distinct missed texts.
+        """
+        hit_s: Dict[bytes, List[float]] = {}
+        miss_s: Dict[bytes, str] = {}
+        with self._document_cache_lock:
+            for text in texts:
+                key = self._text_key(text)
+                if key in hit_s or key in miss_s:
+                    continue
+                vector = self._document_cache.get(key)
+                if vector is None:
+                    miss_s[key] = text
+                else:
+                    self._document_cache.move_to_end(key)
+                    hit_s[key] = vector.tolist()
+        return hit_s, list(miss_s.values())
+
+    def _merge_cached_documents(
+        self, texts: List[str], hit_s: Dict[bytes, List[float]], miss_texts: List[str], miss_vector_s: List[List[float]]
+    ) -> List[List[float]]:
+        """
+        Put the embedded texts into the document cache, and return the vectors of the texts in the original order.
+        """
+        with self._document_cache_lock:
+            for text, vector in zip(miss_texts, miss_vector_s):
+                key = self._text_key(text)
+                hit_s[key] = vector
+                self._document_cache[key] = array("d", vector)
+                self._document_cache.move_to_end(key)
+            while len(self._document_cache) > self.document_cache_size:
+                self._document_cache.popitem(last=False)
+        return [hit_s[self._text_key(text)] for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.document_cache_size <= 0:
+            return self._embed_documents(texts)
+
+        hit_s, miss_texts = self._get_cached_documents(texts)
+        miss_vector_s = self._embed_documents(miss_texts) if miss_texts else []
+        return self._merge_cached_documents(texts, hit_s, miss_texts, miss_vector_s)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.document_cache_size <= 0:
+            return await self._aembed_documents(texts)
+
+        hit_s, miss_texts = self._get_cached_documents(texts)
+        miss_vector_s = await self._aembed_documents(miss_texts) if miss_texts else []
+        return self._merge_cached_documents(texts, hit_s, miss_texts, miss_vector_s)
+
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = self._split_batches(texts)
+        if len(batches) <= 1:
+            return self.embeddings.embed_documents(texts)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            vector_s = executor.map(self.embeddings.embed_documents, batches)  # keep the order of batches
+            return [vector for batch_vector_s in vector_s for vector in batch_vector_s]
+
+    async def _aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.embeddings.aembed_documents(batch)
+
+        vector_s = await asyncio.gather(*[embed_batch(batch) for batch in self._split_batches(texts)])
+        return [vector for batch_vector_s in vector_s for vector in batch_vector_s]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._get_cached_query(text)
+        if vector is not None:
+            return list(vector)
+        if self._query_batcher is not None:
+            result = self._query_batcher.embed(text)
+        else:
+            result = self.embeddings.embed_query(text)
+        self._put_cached_query(text, result)
+        return list(result)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._get_cached_query(text)
+        if vector is not None:
+            return list(vector)
+        if self._query_batcher is not None:
+            result = await self._query_batcher.aembed(text)
+        else:
+            result = await self.embeddings.aembed_query(text)
+        self._put_cached_query(text, result)
+        return list(result)
+
+    def __getattr__(self, item):
+        # expose the attributes of the wrapped model, e.g. `dimensions`
+        if item == "embeddings":
+            raise AttributeError(item)
+        return getattr(self.embeddings, item)
+
+
+@lru_cache(maxsize=None)
+def _get_openai_http_client() -> httpx.Client:
+    """
+    Get the HTTP client shared by the sync requests of the OpenAI models, so the embedding and chat models reuse one
+    connection pool, and the idle connections are kept longer than the 5 seconds of the client default. The async
+    clients stay per model, an async connection pool is bound to the event loop it was opened on.
     """
+    return openai.DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30)
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_cached_embedding_model(model_name: str) -> CachedEmbeddings:
     assert setting.openai.api_key, "OpenAI API key is required for using OpenAI embeddings."
     embeddings = OpenAIEmbeddings(
         model=model_name,
         dimensions=1536,
         api_key=setting.openai.api_key.get_secret_value(),
         base_url=setting.openai.base_url,
+        http_client=_get_openai_http_client(),
     )
+    return CachedEmbeddings(embeddings)
+
+
+def get_embedding_model(model_name: str, return_dim: bool = False) -> Embeddings | tuple[Embeddings, int]:
+    """
+    Get the embedding model based on the model name. The model instance is shared by the same model name, and the
+    query embeddings are cached.
+    Args:
+        model_name (str): Model name.
+        return_dim (bool): Return the embedding dimension if True.
+
+    Returns:
+        Embeddings: Embedding model instance.
+        If return_dim is True, also returns the number of dimensions.
+
+    """
+    embeddings = _get_cached_embedding_model(model_name)
     if return_dim:
         return embeddings, embeddings.dimensions or 1536
     else:
         return embeddings
 
 
+@lru_cache(maxsize=None)
 def get_llm(model_name: str) -> BaseChatModel:
+    """
+    Get the chat model based on the model name. The model instance, and so its HTTP connection pool, is shared by the
+    same model name.
+    """
     assert setting.openai.api_key, "OpenAI API key is required for using OpenAI embeddings."
     model = ChatOpenAI(
         model=model_name,
         api_key=setting.openai.api_key.get_secret_value(),
         base_url=setting.openai.base_url,
         temperature=0,
+        http_client=_get_openai_http_client(),
     )
 
     return model
@@ -78,9 +379,14 @@ def get_llm(model_name: str) -> BaseChatModel:
 
 def get_vector_db(db_type: VectorDBType) -> BaseVectorDataBase | None:
     match db_type:
+        # the backends are imported on use, so a deployment does not load the client of the other backend
         case VectorDBType.LANCE:
+            from aa_rag.db.lancedb_ import LanceDBDataBase
+
             return LanceDBDataBase()
         case VectorDBType.MILVUS:
+            from aa_rag.db.milvus_ import MilvusDataBase
+
             return MilvusDataBase()
         case _:
             raise ValueError(f"Invalid db type: {db_type}")
@@ -92,6 +398,8 @@ def get_nosql_db(db_type: NoSQLDBType) -> BaseNoSQLDataBase | None:
             return TinyDBDataBase()
         case NoSQLDBType.MONGODB:
             return MongoDBDataBase()
+        case NoSQLDBType.SQLITE:
+            return SQLiteDataBase()
         case _:
             raise ValueError(f"Invalid db type: {db_type}")
 
@@ -111,10 +419,36 @@ def get_uuid():
     return str(uuid.uuid4()).replace("-", "")
 
 
+@lru_cache(maxsize=None)
+def _model_field_set(model_cls: Type[BaseModel]) -> frozenset:
+    return frozenset(model_cls.model_fields)
+
+
+def construct_from(model_cls: Type[ModelT], source: BaseModel, **update) -> ModelT:
+    """
+    Build a model from the fields of an already validated model, without validating them again. It is meant for the
+    request items, which are validated by FastAPI and inherit the fields of the parameter models they are split into.
+
+    Args:
+        model_cls (Type[ModelT]): The model to build.
+        source (BaseModel): The validated model to take the field values from.
+        **update: Additional field values, which are not validated either.
+
+    Returns:
+        ModelT: The built model.
+    """
+    field_s = _model_field_set(model_cls)
+    return model_cls.model_construct(**{**{k: v for k, v in source.__dict__.items() if k in field_s}, **update})
+
+
 async def parse_content(params: ParserNeedItem) -> List[Document]:
     if params.parsing_type == ParsingType.MARKITDOWN:
-        parser = MarkitDownParser()
-        source_data = await parser.aparse(**ParserNeedItem(**params.model_dump(exclude={"parsing_type"})).model_dump())
+        from aa_rag.parse.markitdown import MarkitDownParser
+
+        # the parser checks the OSS buckets over the network when it is built, so it is built off the event loop
+        parser = await asyncio.to_thread(MarkitDownParser)
+        # the params are already validated, their fields are passed as they are instead of dumped and validated again
+        source_data = await parser.aparse(**params.__dict__)
     else:
         raise ValueError(f"Invalid parsing type: {params.parsing_type}")
 
@@ -205,7 +539,7 @@ def convert_img_base64_to_file_info(base64_str: str, extra_calculate_value: str|
 
     # 计算二进制数据的 MD5 哈希值
     value = binary_data if extra_calculate_value is None else binary_data + extra_calculate_value.encode("utf-8")
-    md5_hash = hashlib.md5(value).hexdigest()
+    md5_hash = calculate_md5(value)
 
     # 确定文件扩展名
     if mime_type:
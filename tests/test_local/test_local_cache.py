@@ -0,0 +1,86 @@
+import time
+
+from aa_rag.cache.semantic import QueryCache
+
+
+class TestQueryCache:
+    def test_hit_same_query(self):
+        cache = QueryCache(max_size=8, ttl_seconds=60, similarity_threshold=1.0)
+        cache.put("ns", 0, [0.1, 0.2, 0.3], ["result"])
+
+        assert cache.get("ns", 0, [0.1, 0.2, 0.3]) == ["result"]
+        assert cache.stats()["hits"] == 1
+
+    def test_miss_similar_query_by_default(self):
+        cache = QueryCache(max_size=8, ttl_seconds=60, similarity_threshold=1.0)
+        cache.put("ns", 0, [1.0, 0.0, 0.0], ["result"])
+
+        # cosine similarity of about 0.995
+        assert cache.get("ns", 0, [1.0, 0.1, 0.0]) is None
+        assert cache.stats()["misses"] == 1
+
+    def test_hit_similar_query_below_threshold(self):
+        cache = QueryCache(max_size=8, ttl_seconds=60, similarity_threshold=0.99)
+        cache.put("ns", 0, [1.0, 0.0, 0.0], ["result"])
+
+        assert cache.get("ns", 0, [1.0, 0.1, 0.0]) == ["result"]
+        assert cache.get("ns", 0, [0.0, 1.0, 0.0]) is None
+
+    def test_value_is_copied(self):
+        cache = QueryCache(max_size=8, ttl_seconds=60, similarity_threshold=1.0)
+        value = [{"page_content": "text", "metadata": {"score": 1.0}}]
+        cache.put("ns", 0, [0.1, 0.2, 0.3], value)
+        value[0]["metadata"]["score"] = 0.0
+
+        result = cache.get("ns", 0, [0.1, 0.2, 0.3])
+        assert result == [{"page_content": "text", "metadata": {"score": 1.0}}]
+        result[0]["metadata"]["score"] = 0.0
+        assert cache.get("ns", 0, [0.1, 0.2, 0.3]) == [{"page_content": "text", "metadata": {"score": 1.0}}]
+
+    def test_namespace_isolation(self):
+        cache = QueryCache(max_size=8, ttl_seconds=60, similarity_threshold=1.0)
+        cache.put("ns_a", 0, [0.1, 0.2, 0.3], ["a"])
+        cache.put("ns_b", 0, [0.1, 0.2, 0.3], ["b"])
+
+        assert cache.get("ns_a", 0, [0.1, 0.2, 0.3]) == ["a"]
+        assert cache.get("ns_b", 0, [0.1, 0.2, 0.3]) == ["b"]
+        assert cache.get("ns_c", 0, [0.1, 0.2, 0.3]) is None
+
+    def test_version_change_invalidates(self):
+        cache = QueryCache(max_size=8, ttl_seconds=60, similarity_threshold=1.0)
+        cache.put("ns", 0, [0.1, 0.2, 0.3], ["old"])
+
+        assert cache.get("ns", 1, [0.1, 0.2, 0.3]) is None
+        # the entries of the old version are dropped
+        assert cache.stats()["size"] == 0
+
+        cache.put("ns", 1, [0.1, 0.2, 0.3], ["new"])
+        assert cache.get("ns", 1, [0.1, 0.2, 0.3]) == ["new"]
+
+    def test_ttl(self):
+        cache = QueryCache(max_size=8, ttl_seconds=0.01, similarity_threshold=1.0)
+        cache.put("ns", 0, [0.1, 0.2, 0.3], ["result"])
+        time.sleep(0.02)
+
+        assert cache.get("ns", 0, [0.1, 0.2, 0.3]) is None
+        assert cache.stats()["size"] == 0
+
+    def test_lru_eviction(self):
+        cache = QueryCache(max_size=2, ttl_seconds=60, similarity_threshold=1.0)
+        cache.put("ns", 0, [1.0, 0.0, 0.0], ["x"])
+        cache.put("ns", 0, [0.0, 1.0, 0.0], ["y"])
+        # x is used, so y is the least recently used entry
+        assert cache.get("ns", 0, [1.0, 0.0, 0.0]) == ["x"]
+        cache.put("ns", 0, [0.0, 0.0, 1.0], ["z"])
+
+        assert cache.stats()["evictions"] == 1
+        assert cache.get("ns", 0, [0.0, 1.0, 0.0]) is None
+        assert cache.get("ns", 0, [1.0, 0.0, 0.0]) == ["x"]
+        assert cache.get("ns", 0, [0.0, 0.0, 1.0]) == ["z"]
+
+    def test_disabled(self):
+        cache = QueryCache(max_size=0, ttl_seconds=60, similarity_threshold=1.0)
+        cache.put("ns", 0, [0.1, 0.2, 0.3], ["result"])
+
+        assert not cache.enabled
+        assert cache.get("ns", 0, [0.1, 0.2, 0.3]) is None
@@ -1,3 +1,44 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from aa_rag import utils
+from aa_rag.engine.simple_chunk import SimpleChunk, SimpleChunkInitParams, SimpleChunkIndexParams
+from aa_rag.gtypes.enums import DBMode
+
+
+class _FakeEmbeddings(Embeddings):
+    dimensions = 4
+
+    def __init__(self):
+        self.fail_on_call: int | None = None
+        self.call_count = 0
+
+    def embed_documents(self, texts):
+        self.call_count += 1
+        if self.call_count == self.fail_on_call:
+            raise RuntimeError("embedding failed")
+        return [[float(len(text)), 1.0, 0.0, 0.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.0, 0.0]
+
+
+@pytest.fixture()
+def engine(monkeypatch):
+    embeddings = _FakeEmbeddings()
+    monkeypatch.setattr(utils, "get_embedding_model", lambda model_name, return_dim=False: (embeddings, 4))
+    engine = SimpleChunk(SimpleChunkInitParams(knowledge_name="test_overwrite", identifier="test_identifier"))
+    yield engine
+    if engine.table_exist:
+        engine.db.drop_table(engine.table_name)
+
+
+def _stored_texts(engine):
+    with engine.db.using(engine.table_name) as table:
+        return sorted(row["text"] for row in table.query("", output_fields=["text"], limit=-1))
+
+
 class TestChunk:
     def test_index(self, client):
         params = {
@@ -93,3 +134,17 @@ class TestChunk:
             json={"identifier": "test_identifier", "knowledge_name": "test"}
         )
         assert updated_statistic_response.status_code == 404
+
+
+class TestChunkIndexOverwrite:
+    def test_failed_embedding_keeps_stored_data(self, engine):
+        engine.index(SimpleChunkIndexParams(source_data=[Document(page_content="old chunk")]))
+        # the second batch fails to embed
+        engine.embeddings.fail_on_call = engine.embeddings.call_count + 2
+        new_doc_s = [Document(page_content=f"new chunk {i}") for i in range(3)]
+        with pytest.raises(RuntimeError):
+            engine.index(
+                SimpleChunkIndexParams(source_data=new_doc_s, retrieve_mode=DBMode.OVERWRITE), write_batch_size=2
+            )
+
+        assert _stored_texts(engine) == ["old chunk"]
@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from aa_rag.utils import CachedEmbeddings, QueryBatcher
+
+
+def _vector(text):
+    return [float(len(text)), float(ord(text[0]))]
+
+
+class _FakeEmbeddings(Embeddings):
+    def __init__(self):
+        self.document_call_s = []
+        self.query_call_s = []
+
+    def embed_documents(self, texts):
+        self.document_call_s.append(list(texts))
+        return [_vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.query_call_s.append(text)
+        return _vector(text)
+
+
+class TestQueryBatcher:
+    def test_lone_query_is_sent_at_once(self):
+        call_s = []
+        batcher = QueryBatcher(lambda texts: call_s.append(texts) or [_vector(_) for _ in texts], max_wait_ms=2000)
+
+        start = time.monotonic()
+        assert batcher.embed("abc") == _vector("abc")
+        # the window is not waited for when no batch is in flight
+        assert time.monotonic() - start < 1
+        assert call_s == [["abc"]]
+
+    def test_queries_are_merged_while_a_batch_is_in_flight(self):
+        release = threading.Event()
+        call_s = []
+
+        def embed_func(texts):
+            call_s.append(texts)
+            if texts == ["a"]:
+                release.wait(5)
+            return [_vector(_) for _ in texts]
+
+        batcher = QueryBatcher(embed_func, max_wait_ms=300)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            first = executor.submit(batcher.embed, "a")
+            while not call_s:
+                time.sleep(0.01)
+            assert batcher._in_flight == 1
+
+            rest = [executor.submit(batcher.embed, text) for text in ("bb", "ccc")]
+            assert [future.result(5) for future in rest] == [_vector("bb"), _vector("ccc")]
+            release.set()
+            assert first.result(5) == _vector("a")
+
+        assert call_s[0] == ["a"]
+        assert sorted(call_s[1]) == ["bb", "ccc"]
+        assert batcher._in_flight == 0
+
+    def test_aembed(self):
+        batcher = QueryBatcher(lambda texts: [_vector(_) for _ in texts], max_wait_ms=50)
+
+        async def main():
+            return await asyncio.gather(*[batcher.aembed(text) for text in ("a", "bb", "ccc")])
+
+        assert asyncio.run(main()) == [_vector("a"), _vector("bb"), _vector("ccc")]
+        assert batcher._in_flight == 0
+
+    def test_error_is_raised_to_every_caller(self):
+        fail = [True]
+
+        def embed_func(texts):
+            if fail[0]:
+                raise RuntimeError("embedding failed")
+            return [_vector(_) for _ in texts]
+
+        batcher = QueryBatcher(embed_func, max_wait_ms=50)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_s = [executor.submit(batcher.embed, text) for text in ("a", "bb")]
+            for future in future_s:
+                with pytest.raises(RuntimeError):
+                    future.result(5)
+        assert batcher._in_flight == 0
+
+        # the batcher keeps working after a failed batch
+        fail[0] = False
+        assert batcher.embed("a") == _vector("a")
+
+    def test_count_mismatch_fails_the_batch(self):
+        batcher = QueryBatcher(lambda texts: [], max_wait_ms=50)
+
+        with pytest.raises(ValueError):
+            batcher.embed("a")
+        assert batcher._in_flight == 0
+
+
+class TestCachedEmbeddings:
+    def test_query_cache(self):
+        fake = _FakeEmbeddings()
+        embeddings = CachedEmbeddings(fake, maxsize=1, query_batch_wait_ms=0)
+
+        assert embeddings.embed_query("a") == _vector("a")
+        assert embeddings.embed_query("a") == _vector("a")
+        assert fake.query_call_s == ["a"]
+
+        # the least recently used query is evicted
+        embeddings.embed_query("bb")
+        embeddings.embed_query("a")
+        assert fake.query_call_s == ["a", "bb", "a"]
+
+    def test_query_batcher(self):
+        fake = _FakeEmbeddings()
+        embeddings = CachedEmbeddings(fake, query_batch_wait_ms=50)
+
+        assert embeddings.embed_query("a") == _vector("a")
+        assert asyncio.run(embeddings.aembed_query("a")) == _vector("a")
+        # the queries go through the document endpoint, the second one is cached
+        assert fake.document_call_s == [["a"]]
+        assert fake.query_call_s == []
+
+    def test_document_cache(self):
+        fake = _FakeEmbeddings()
+        embeddings = CachedEmbeddings(fake, document_cache_size=8)
+
+        assert embeddings.embed_documents(["a", "bb", "a"]) == [_vector("a"), _vector("bb"), _vector("a")]
+        assert embeddings.embed_documents(["bb", "ccc"]) == [_vector("bb"), _vector("ccc")]
+        assert asyncio.run(embeddings.aembed_documents(["ccc", "a"])) == [_vector("ccc"), _vector("a")]
+        # only the distinct missed texts are embedded
+        assert fake.document_call_s == [["a", "bb"], ["ccc"]]
+
+    def test_document_cache_returns_the_embedded_floats(self):
+        fake = _FakeEmbeddings()
+        fake.embed_documents = lambda texts: [[1.1, 0.123456789] for _ in texts]
+        embeddings = CachedEmbeddings(fake, document_cache_size=8)
+
+        assert embeddings.embed_documents(["a"]) == embeddings.embed_documents(["a"]) == [[1.1, 0.123456789]]
+
+    def test_batches_keep_the_order(self):
+        fake = _FakeEmbeddings()
+        embeddings = CachedEmbeddings(fake, batch_size=2, document_cache_size=0)
+        text_s = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+        assert embeddings.embed_documents(text_s) == [_vector(_) for _ in text_s]
+        assert sorted(len(_) for _ in fake.document_call_s) == [1, 2, 2]
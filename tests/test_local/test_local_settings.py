@@ -0,0 +1,67 @@
+import pytest
+
+from aa_rag import settings
+from aa_rag.gtypes.enums import NoSQLDBType
+
+
+class TestParseEnvValue:
+    @pytest.mark.parametrize(
+        "value, expected",
+        [("true", True), ("True", True), ("1", True), ("yes", True), ("false", False), ("0", False), ("off", False)],
+    )
+    def test_bool(self, value, expected):
+        assert settings._parse_env_value(value, False) is expected
+        assert settings._parse_env_value(value, True) is expected
+
+    def test_number(self):
+        assert settings._parse_env_value("8", 1) == 8
+        assert settings._parse_env_value("0.5", 1) == 0.5
+        assert settings._parse_env_value("300", 1.0) == 300
+
+    def test_enum(self):
+        assert settings._parse_env_value("sqlite", NoSQLDBType.TINYDB) is NoSQLDBType.SQLITE
+
+    def test_str(self):
+        # a string is not evaluated as a python literal
+        assert settings._parse_env_value("123", "default") == "123"
+        assert settings._parse_env_value("[1, 2]", None) == "[1, 2]"
+
+    def test_literal(self):
+        assert settings._parse_env_value("[1, 2]", []) == [1, 2]
+
+    @pytest.mark.parametrize(
+        "value, default",
+        [("abc", 1), ("1.2.3", 1.0), ("not_a_db", NoSQLDBType.TINYDB), ("[1,", [])],
+    )
+    def test_invalid_value_is_returned_as_str(self, value, default):
+        assert settings._parse_env_value(value, default) == value
+
+
+class TestLoadEnv:
+    @pytest.fixture()
+    def env(self, monkeypatch):
+        env = {}
+        monkeypatch.setattr(settings, "_dotenv_values", lambda: env)
+        return env
+
+    def test_missing_key(self, env):
+        assert settings.load_env("AA_RAG_TEST_KEY", 5) == 5
+        assert settings.load_env("AA_RAG_TEST_KEY") is None
+
+    def test_tuple_default(self, env):
+        default = (NoSQLDBType.TINYDB, NoSQLDBType.MONGODB)
+        assert settings.load_env("DB_NOSQL", default) is NoSQLDBType.TINYDB
+
+        env["ENVIRONMENT"] = "Production"
+        assert settings.load_env("DB_NOSQL", default) is NoSQLDBType.MONGODB
+
+        env["ENVIRONMENT"] = "unknown"
+        assert settings.load_env("DB_NOSQL", default) is NoSQLDBType.TINYDB
+
+    def test_tuple_default_with_value(self, env):
+        env.update({"ENVIRONMENT": "Production", "DB_NOSQL": "sqlite"})
+        assert settings.load_env("DB_NOSQL", (NoSQLDBType.TINYDB, NoSQLDBType.MONGODB)) is NoSQLDBType.SQLITE
+
+    def test_bool_value(self, env):
+        env["DEBUG_MODE"] = "false"
+        assert settings.load_env("DEBUG_MODE", True) is False
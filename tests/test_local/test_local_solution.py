@@ -1,3 +1,8 @@
+import pytest
+
+from aa_rag.knowledge_base.built_in.solution import SolutionKnowledge
+
+
 class TestSolution:
     def test_root(self, client):
         response = client.get("/solution/")
@@ -85,3 +90,21 @@ class TestSolution:
         response = client.post("/solution/delete", json=params)
         # The API should handle this gracefully
         assert response.status_code == 404
+
+
+class TestSolutionGuideIndex:
+    @pytest.mark.parametrize(
+        "result, expected",
+        [
+            ("0", 0),
+            (" 2\n", 2),
+            ("-1", None),
+            ("3", None),
+            ("1.0", None),
+            ("id: 1", None),
+            ("1, 2", None),
+            ("", None),
+        ],
+    )
+    def test_parse_guide_index(self, result, expected):
+        assert SolutionKnowledge._parse_guide_index(result, 3) == expected
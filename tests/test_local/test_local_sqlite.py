@@ -0,0 +1,101 @@
+import pytest
+
+from aa_rag.db.sqlite_ import SQLiteDataBase
+
+
+@pytest.fixture()
+def table(tmp_path):
+    db = SQLiteDataBase(uri=str(tmp_path / "sqlite.db"))
+    table_name = "test_local_sqlite"
+    with db.using(table_name) as table:
+        table.insert(
+            [
+                {"name": "alice", "age": 30, "tags": ["a"], "meta": {"city": "paris", "zip": 75000}},
+                {"name": "bob", "age": 40, "active": False, "meta": {"city": "berlin"}},
+                {"name": "carol", "age": 50, "active": True},
+            ]
+        )
+        yield table
+    db.drop_table(table_name)
+
+
+def _names(records):
+    return sorted(record["name"] for record in records)
+
+
+class TestSQLiteQuery:
+    def test_eq_and_comparison(self, table):
+        assert _names(table.select({"name": "alice"})) == ["alice"]
+        assert _names(table.select({"age": {"$gt": 30, "$lte": 50}})) == ["bob", "carol"]
+        assert _names(table.select({"age": {"$ne": 40}})) == ["alice", "carol"]
+        assert _names(table.select()) == ["alice", "bob", "carol"]
+
+    def test_in_nin(self, table):
+        assert _names(table.select({"name": {"$in": ["alice", "carol", "dave"]}})) == ["alice", "carol"]
+        assert _names(table.select({"name": {"$in": []}})) == []
+        assert _names(table.select({"name": {"$nin": ["alice"]}})) == ["bob", "carol"]
+        # a missing field is not in the list
+        assert _names(table.select({"active": {"$nin": [True]}})) == ["alice", "bob"]
+        with pytest.raises(ValueError):
+            table.select({"name": {"$in": "alice"}})
+
+    def test_exists(self, table):
+        assert _names(table.select({"active": {"$exists": True}})) == ["bob", "carol"]
+        assert _names(table.select({"active": {"$exists": False}})) == ["alice"]
+        # a false value exists
+        assert _names(table.select({"active": False})) == ["bob"]
+
+    def test_nested_key(self, table):
+        assert _names(table.select({"meta.city": "paris"})) == ["alice"]
+        assert _names(table.select({"meta.zip": {"$gte": 70000}})) == ["alice"]
+        assert _names(table.select({"meta.city": {"$exists": False}})) == ["carol"]
+
+    def test_logical(self, table):
+        assert _names(table.select({"$or": [{"name": "alice"}, {"age": 50}]})) == ["alice", "carol"]
+        assert _names(table.select({"$and": [{"age": {"$gt": 30}}, {"active": True}]})) == ["carol"]
+        assert _names(table.select({"$nor": [{"name": "alice"}, {"name": "bob"}]})) == ["carol"]
+        assert _names(table.select({"$not": {"name": "alice"}})) == ["bob", "carol"]
+
+    def test_unsupported_operator(self, table):
+        with pytest.raises(ValueError):
+            table.select({"age": {"$regex": "4"}})
+
+
+class TestSQLiteWrite:
+    def test_insert(self, table):
+        row_id = table.insert({"name": "dave", "age": 20})
+        assert isinstance(row_id, int)
+        row_id_s = table.insert([{"name": "erin"}, {"name": "frank"}])
+        assert len(row_id_s) == 2
+        assert _names(table.select({"name": {"$in": ["dave", "erin", "frank"]}})) == ["dave", "erin", "frank"]
+        with pytest.raises(ValueError):
+            table.insert("dave")
+
+    def test_upsert_update(self, table):
+        assert table.upsert({"name": "alice", "age": 31}, query={"name": "alice"}) == 1
+        record_s = table.select({"name": "alice"})
+        # the other fields are kept
+        assert len(record_s) == 1
+        assert record_s[0]["age"] == 31
+        assert record_s[0]["meta"] == {"city": "paris", "zip": 75000}
+
+    def test_upsert_insert(self, table):
+        assert table.upsert({"name": "dave", "age": 20}, query={"name": "dave"}) == 1
+        assert table.select({"name": "dave"}) == [{"name": "dave", "age": 20}]
+        assert len(table.select()) == 4
+
+    def test_update_delete(self, table):
+        assert table.update({"active": True}, {"active": {"$exists": False}}) == 1
+        assert _names(table.select({"active": True})) == ["alice", "carol"]
+        assert table.delete({"age": {"$lt": 45}}) == 2
+        assert _names(table.select()) == ["carol"]
+
+
+class TestSQLiteIselect:
+    def test_iselect(self, table):
+        record_s = table.iselect({"age": {"$gte": 40}}, batch_size=1)
+        assert not isinstance(record_s, list)
+        assert [record["name"] for record in record_s] == ["bob", "carol"]
+
+    def test_iselect_all_in_insert_order(self, table):
+        assert [record["name"] for record in table.iselect()] == ["alice", "bob", "carol"]
@@ -0,0 +1,33 @@
+import pytest
+
+from aa_rag.db.tinydb_ import TinyDBDataBase
+
+
+@pytest.fixture()
+def table(tmp_path):
+    db = TinyDBDataBase(uri=str(tmp_path / "db.json"))
+    table_name = "test_local_tinydb"
+    with db.using(table_name) as table:
+        table.insert({"name": "alice", "age": 30})
+        table.insert({"name": "bob", "age": 40, "active": False})
+        table.insert({"name": "carol", "age": 50, "active": None})
+        yield table
+    db.drop_table(table_name)
+
+
+def _names(records):
+    return sorted(record["name"] for record in records)
+
+
+class TestTinyDBExists:
+    def test_exists_true(self, table):
+        # a field with a false or None value exists
+        assert _names(table.select({"active": {"$exists": True}})) == ["bob", "carol"]
+
+    def test_exists_false(self, table):
+        assert _names(table.select({"active": {"$exists": False}})) == ["alice"]
+
+    def test_exists_with_other_operators(self, table):
+        assert _names(table.select({"active": {"$exists": True}, "age": {"$gt": 40}})) == ["carol"]
+        assert _names(table.select({"$or": [{"active": {"$exists": False}}, {"age": 40}]})) == ["alice", "bob"]
+        assert _names(table.iselect({"active": {"$exists": False}})) == ["alice"]